@@ -0,0 +1,252 @@
+# Arquivo: benchmark.py
+
+import argparse
+import json
+import logging
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+from core import SoyLogisticsNet
+
+INFOS = ["Pavimentada", "Concessionada", "Não Pavimentada", "Precária"]
+TAMANHOS_PADRAO = [100, 1000, 10000, 50000]
+
+
+def gerar_malha_sintetica(n_nos: int, frac_ferrovia: float = 0.2, semente: int = 0):
+    """
+    Grade lado x lado no esquema do dados.json: rodovias nos dois sentidos
+    entre vizinhos e uma fração das linhas da grade como ferrovia (ligações
+    mais baratas, forçando transbordos). Origem no canto (0, 0) e portos
+    espalhados na última linha. Retorna (dados, origem, destinos).
+    """
+    rng = np.random.default_rng(semente)
+    lado = max(2, math.isqrt(n_nos))
+    nome = [[f"N{i}_{j}" for j in range(lado)] for i in range(lado)]
+    linhas_ferro = set(
+        rng.choice(lado, size=int(round(lado * frac_ferrovia)), replace=False).tolist()
+    )
+
+    nodes = {nome[i][j]: [j, -i] for i in range(lado) for j in range(lado)}
+    edges = []
+    for i in range(lado):
+        for j in range(lado):
+            for a, b in ((i + 1, j), (i, j + 1)):
+                if a >= lado or b >= lado:
+                    continue
+                ferrovia = i == a and i in linhas_ferro
+                peso = float(rng.uniform(5, 15) * (0.6 if ferrovia else 1.0))
+                for u, v in ((nome[i][j], nome[a][b]), (nome[a][b], nome[i][j])):
+                    edges.append(
+                        {
+                            "u": u,
+                            "v": v,
+                            "weight": round(peso, 2),
+                            "distance": round(peso * 8, 1),
+                            "label": "FERRO" if ferrovia else "BR",
+                            "info": (
+                                "MALHA FERROVIÁRIA"
+                                if ferrovia
+                                else INFOS[int(rng.integers(len(INFOS)))]
+                            ),
+                            "type": "rail" if ferrovia else "road",
+                            "failure_prob": round(float(rng.uniform(0, 0.2)), 3),
+                        }
+                    )
+    destinos = [nome[lado - 1][j] for j in sorted({0, lado // 2, lado - 1})]
+    dados = {"meta": {"version": "sintetica", "nos": lado * lado}, "nodes": nodes}
+    dados["edges"] = edges
+    return dados, nome[0][0], destinos
+
+
+def _cronometrar(funcao, repeticoes: int) -> float:
+    """Mediana (em ms) de várias execuções."""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos)
+
+
+def medir(
+    n_nos: int,
+    frac_ferrovia: float,
+    repeticoes: int,
+    renderizar: bool,
+    amostras_falhas: int = 1000,
+) -> dict:
+    dados, origem, destinos = gerar_malha_sintetica(n_nos, frac_ferrovia)
+    with tempfile.TemporaryDirectory() as pasta:
+        arquivo = os.path.join(pasta, "malha.json")
+        with open(arquivo, "w", encoding="utf-8") as f:
+            json.dump(dados, f)
+
+        rede = SoyLogisticsNet()
+        carga_ms = _cronometrar(
+            lambda: rede.carregar_dados(arquivo, usar_cache=False), 1
+        )
+        # Memória medida numa carga à parte: o tracemalloc distorce o tempo
+        tracemalloc.start()
+        rede.carregar_dados(arquivo, usar_cache=False)
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        rede.carregar_dados(arquivo)  # Grava o .npz ao lado do JSON
+        carga_cache_ms = _cronometrar(lambda: rede.carregar_dados(arquivo), repeticoes)
+
+    def _rota():
+        rede.limpar_cache_rotas()
+        rede.buscar_melhor_rota(origem, destinos)
+
+    estado = {"chuva": False}
+
+    def _clima():
+        estado["chuva"] = not estado["chuva"]
+        rede.aplicar_condicoes_climaticas(estado["chuva"])
+
+    rng = np.random.default_rng(1)
+    xs = np.array([p[0] for p in rede.pos.values()])
+    ys = np.array([p[1] for p in rede.pos.values()])
+    cliques = list(
+        zip(
+            rng.uniform(xs.min(), xs.max(), 200).tolist(),
+            rng.uniform(ys.min(), ys.max(), 200).tolist(),
+        )
+    )
+
+    resultado = {
+        "nos": rede.graph.number_of_nodes(),
+        "arestas": rede.graph.number_of_edges(),
+        "carregar_dados_ms": carga_ms,
+        "carregar_dados_cache_ms": carga_cache_ms,
+        "memoria_pico_carga_mb": pico / 2**20,
+        "aplicar_condicoes_climaticas_ms": _cronometrar(_clima, repeticoes),
+        "buscar_melhor_rota_ms": _cronometrar(_rota, repeticoes),
+        "find_closest_edge_ms": _cronometrar(
+            lambda: [rede._find_closest_edge(x, y) for x, y in cliques], repeticoes
+        )
+        / len(cliques),
+        # Monte Carlo de falhas: uma execução (é a métrica mais cara)
+        "simular_falhas_ms": _cronometrar(
+            lambda: rede.simular_falhas(origem, destinos, amostras_falhas, semente=1), 1
+        ),
+    }
+    if renderizar:
+        import matplotlib
+
+        matplotlib.use("Agg")
+        from matplotlib.figure import Figure
+
+        fig = Figure(figsize=(16, 9))
+        ax = fig.add_subplot()
+        _, caminho = rede.buscar_melhor_rota(origem, destinos)
+        resultado["desenhar_mapa_inicial_ms"] = _cronometrar(
+            lambda: rede.desenhar_mapa_interativo(ax, set(), caminho), 1
+        )
+        rede.tempos_quadros.clear()
+        for i in range(1, len(caminho) + 1):
+            rede.desenhar_mapa_interativo(ax, set(), caminho, caminho[:i])
+        resultado["desenhar_mapa_quadro_ms"] = (
+            statistics.median(rede.tempos_quadros) * 1000
+        )
+    return resultado
+
+
+def _commit_atual() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconhecido"
+
+
+def comparar(atual: dict, anterior: dict):
+    """Imprime a razão atual/anterior de cada métrica (>1 = regressão)."""
+    base = {r["nos_pedidos"]: r for r in anterior["resultados"]}
+    for r in atual["resultados"]:
+        ref = base.get(r["nos_pedidos"])
+        if ref is None:
+            continue
+        for chave, valor in r.items():
+            if chave.endswith(("_ms", "_mb")) and ref.get(chave):
+                razao = valor / ref[chave]
+                alerta = "  <-- REGRESSÃO" if razao > 1.2 else ""
+                print(f"{r['nos_pedidos']:>6} {chave:<34} x{razao:5.2f}{alerta}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark dos caminhos críticos em malhas sintéticas."
+    )
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=TAMANHOS_PADRAO)
+    parser.add_argument("--frac-ferrovia", type=float, default=0.2)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument(
+        "--max-render",
+        type=int,
+        default=1000,
+        help="Maior malha em que o desenho do mapa é medido.",
+    )
+    parser.add_argument(
+        "--amostras-falhas",
+        type=int,
+        default=1000,
+        help="Amostras do Monte Carlo de falhas (simular_falhas).",
+    )
+    parser.add_argument("--saida", default="benchmark_resultados.json")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior.")
+    args = parser.parse_args(argv)
+    logging.getLogger("LogisticsCore").setLevel(logging.WARNING)
+
+    resultados = []
+    for n in args.tamanhos:
+        r = medir(
+            n,
+            args.frac_ferrovia,
+            args.repeticoes,
+            n <= args.max_render,
+            args.amostras_falhas,
+        )
+        r["nos_pedidos"] = n
+        resultados.append(r)
+        print(
+            f"{n:>6} nós | carga {r['carregar_dados_ms']:8.1f} ms | "
+            f"rota {r['buscar_melhor_rota_ms']:8.2f} ms | "
+            f"clima {r['aplicar_condicoes_climaticas_ms']:7.2f} ms | "
+            f"clique {r['find_closest_edge_ms']:6.3f} ms | "
+            f"falhas {r['simular_falhas_ms']:9.1f} ms"
+        )
+
+    relatorio = {
+        "commit": _commit_atual(),
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "frac_ferrovia": args.frac_ferrovia,
+        "resultados": resultados,
+    }
+    with open(args.saida, "w", encoding="utf-8") as f:
+        json.dump(relatorio, f, indent=2, ensure_ascii=False)
+    print(f"Salvo: {args.saida}")
+
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as f:
+            comparar(relatorio, json.load(f))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,266 @@
+# Arquivo: carga.py
+
+import csv
+import hashlib
+import io
+import json
+import logging
+import os
+import tempfile
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from malha import BUFFERS, MalhaCompacta
+
+logger = logging.getLogger("LogisticsCore")
+
+VERSAO_CACHE = 2
+CAMPOS_TEXTO = ("label", "info")  # O modal ("type") já vai no buffer da malha
+
+
+class RedeCompilada:
+    """
+    Malha pronta para o núcleo: a forma CSR (malha.MalhaCompacta), os textos
+    das arestas e os segmentos desenháveis, todos na ordem CSR. É o que o
+    cache .npz guarda, então a recarga não percorre aresta por aresta.
+    """
+
+    def __init__(
+        self,
+        malha: MalhaCompacta,
+        pos: Dict[str, Tuple[float, float]],
+        textos: Dict[str, np.ndarray],
+        segmentos: np.ndarray,
+        coords: np.ndarray,
+        capacidade_portos: Dict[str, float],
+        sha: str,
+    ):
+        self.malha = malha
+        self.pos = pos
+        self.textos = textos  # Campo -> texto de cada aresta (posição CSR)
+        self.segmentos = segmentos  # Posições CSR das arestas com coordenadas
+        self.coords = coords  # (x1, y1, x2, y2) de cada segmento
+        self.capacidade_portos = capacidade_portos
+        self.sha = sha
+
+
+def caminho_cache(caminho: str) -> str:
+    return caminho + ".cache.npz"
+
+
+def ler_rede(caminho: str, usar_cache: bool = True) -> RedeCompilada:
+    """
+    Lê a malha em .json, .jsonl (um nó/aresta por linha) ou .csv (lista de
+    arestas) e a compila (ver RedeCompilada). Com usar_cache, o .npz ao lado
+    do arquivo é reaproveitado enquanto o mtime (ou, se ele mudou, o hash)
+    do arquivo de origem for o mesmo.
+    """
+    cache = caminho_cache(caminho)
+    estado = os.stat(caminho)
+    if usar_cache and os.path.exists(cache):
+        try:
+            rede = _ler_cache(cache, caminho, estado)
+            if rede is not None:
+                logger.info(f"Cache binário reaproveitado: {cache}")
+                return rede
+        except Exception as e:  # Cache truncado/corrompido: relê a origem
+            logger.warning(f"Cache binário ignorado ({cache}): {e}")
+
+    extensao = os.path.splitext(caminho)[1].lower()
+    if extensao == ".jsonl":
+        dados = _ler_jsonl(caminho)
+    elif extensao == ".csv":
+        dados = _ler_csv(caminho)
+    else:
+        with open(caminho, "rb") as f:
+            conteudo = f.read()
+        data = json.loads(conteudo.decode("utf-8"))
+        dados = (
+            {k: tuple(v) for k, v in data["nodes"].items()},
+            data["edges"],
+            dict(data.get("port_capacity", {})),
+            hashlib.sha256(conteudo).hexdigest(),
+        )
+    rede = compilar(*dados)
+
+    if usar_cache:
+        try:
+            _salvar_cache(cache, estado, rede)
+        except OSError as e:
+            logger.warning(f"Não foi possível gravar o cache binário: {e}")
+    return rede
+
+
+def compilar(
+    pos: Dict[str, Tuple[float, float]],
+    arestas: List[dict],
+    capacidade_portos: Dict[str, float],
+    sha: str,
+) -> RedeCompilada:
+    """Arestas lidas da origem -> RedeCompilada (repetidas: vale a última)."""
+    unicas = {(a["u"], a["v"]): a for a in arestas}
+    nos = list(dict.fromkeys(no for u, v in unicas for no in (u, v)))
+    malha = MalhaCompacta(nos, [(u, v, a) for (u, v), a in unicas.items()])
+
+    ordem = [malha.posicao[(malha.indice[u], malha.indice[v])] for u, v in unicas]
+    textos = {}
+    for campo in CAMPOS_TEXTO:
+        coluna = np.empty(len(ordem), dtype=object)
+        coluna[ordem] = [a[campo] for a in unicas.values()]
+        textos[campo] = coluna.astype(str)
+
+    xy = np.array([pos.get(no, (np.nan, np.nan)) for no in nos], dtype=float).reshape(
+        -1, 2
+    )
+    coords = np.hstack([xy[malha.origem], xy[malha.destino]])
+    desenhavel = ~np.isnan(coords).any(axis=1) & (
+        (coords[:, 0] != coords[:, 2]) | (coords[:, 1] != coords[:, 3])
+    )
+    segmentos = np.flatnonzero(desenhavel)
+    return RedeCompilada(
+        malha, dict(pos), textos, segmentos, coords[segmentos], capacidade_portos, sha
+    )
+
+
+def _linhas_com_hash(caminho: str, sha):
+    """Percorre o arquivo linha a linha, alimentando o hash no caminho."""
+    with open(caminho, "rb") as f:
+        for linha in f:
+            sha.update(linha)
+            yield linha.decode("utf-8")
+
+
+def _ler_jsonl(caminho: str):
+    # Registros: {"node": nome, "pos": [x, y]}, {"port_capacity": {...}},
+    # {"meta": {...}} ou uma aresta no mesmo formato de "edges" do .json
+    sha = hashlib.sha256()
+    pos, arestas, capacidade_portos = {}, [], {}
+    for linha in _linhas_com_hash(caminho, sha):
+        if not linha.strip():
+            continue
+        registro = json.loads(linha)
+        if "node" in registro:
+            pos[registro["node"]] = tuple(registro["pos"])
+        elif "port_capacity" in registro:
+            capacidade_portos.update(registro["port_capacity"])
+        elif "u" in registro:
+            arestas.append(registro)
+    return pos, arestas, capacidade_portos, sha.hexdigest()
+
+
+def _ler_csv(caminho: str):
+    # Cabeçalho: u,v,weight,distance,label,info,type[,failure_prob][,capacity]
+    # e, opcionalmente, x_u,y_u,x_v,y_v com as coordenadas dos nós
+    sha = hashlib.sha256()
+    pos, arestas = {}, []
+    for linha in csv.DictReader(_linhas_com_hash(caminho, sha)):
+        aresta = {
+            "u": linha["u"],
+            "v": linha["v"],
+            "label": linha["label"],
+            "info": linha["info"],
+            "type": linha["type"],
+            "weight": float(linha["weight"]),
+            "distance": float(linha["distance"]),
+            "failure_prob": float(linha.get("failure_prob") or 0.0),
+        }
+        if linha.get("capacity"):
+            aresta["capacity"] = float(linha["capacity"])
+        arestas.append(aresta)
+        if linha.get("x_u"):
+            pos[linha["u"]] = (float(linha["x_u"]), float(linha["y_u"]))
+            pos[linha["v"]] = (float(linha["x_v"]), float(linha["y_v"]))
+    return pos, arestas, {}, sha.hexdigest()
+
+
+def _salvar_cache(cache: str, estado: os.stat_result, rede: RedeCompilada):
+    malha = rede.malha
+    arrays = {
+        "versao": np.array(VERSAO_CACHE),
+        "origem_tamanho": np.array(estado.st_size),
+        "origem_mtime": np.array(estado.st_mtime_ns),
+        "origem_sha256": np.array(rede.sha),
+        "pos_nos": np.array(list(rede.pos), dtype=str),
+        "pos": np.array(list(rede.pos.values()), dtype=float).reshape(-1, 2),
+        "nos": np.array(malha.nos, dtype=str),
+        "modais": np.array(malha.modais, dtype=str),
+        "segmentos": rede.segmentos,
+        "segmentos_coords": rede.coords,
+        "portos": np.array(list(rede.capacidade_portos), dtype=str),
+        "portos_capacidade": np.array(
+            list(rede.capacidade_portos.values()), dtype=float
+        ),
+    }
+    for nome in BUFFERS:
+        arrays["malha_" + nome] = getattr(malha, nome)
+    for campo in CAMPOS_TEXTO:
+        # Textos repetidos viram códigos inteiros + tabela de valores únicos
+        valores, codigos = np.unique(rede.textos[campo], return_inverse=True)
+        arrays[campo + "_valores"] = valores
+        arrays[campo + "_codigos"] = codigos.reshape(-1).astype(np.int32)
+
+    # Grava em memória e troca de uma vez: leitores nunca veem cache parcial
+    buffer = io.BytesIO()
+    np.savez(buffer, **arrays)
+    gravar_atomico(cache, buffer.getvalue())
+
+
+def gravar_atomico(destino: str, conteudo: bytes):
+    """
+    Grava em um temporário exclusivo na mesma pasta e troca de uma vez:
+    processos gravando o mesmo arquivo em paralelo (workers do pool) não
+    disputam o temporário, e leitores nunca veem um arquivo parcial.
+    """
+    fd, temporario = tempfile.mkstemp(
+        prefix=os.path.basename(destino) + ".",
+        suffix=".tmp",
+        dir=os.path.dirname(destino) or ".",
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(conteudo)
+        os.replace(temporario, destino)
+    except BaseException:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+
+
+def _ler_cache(cache: str, caminho: str, estado: os.stat_result):
+    with np.load(cache, allow_pickle=False) as z:
+        if int(z["versao"]) != VERSAO_CACHE:
+            return None
+        sha = str(z["origem_sha256"])
+        mesmo_arquivo = (
+            int(z["origem_tamanho"]) == estado.st_size
+            and int(z["origem_mtime"]) == estado.st_mtime_ns
+        )
+        if not mesmo_arquivo:
+            # mtime mudou (ex.: checkout): o conteúdo ainda pode ser o mesmo
+            with open(caminho, "rb") as f:
+                if hashlib.sha256(f.read()).hexdigest() != sha:
+                    return None
+
+        malha = MalhaCompacta.de_arrays(
+            z["nos"].tolist(),
+            z["modais"].tolist(),
+            {nome: z["malha_" + nome] for nome in BUFFERS},
+        )
+        pos = dict(zip(z["pos_nos"].tolist(), map(tuple, z["pos"].tolist())))
+        textos = {
+            campo: z[campo + "_valores"][z[campo + "_codigos"]]
+            for campo in CAMPOS_TEXTO
+        }
+        capacidade_portos = dict(
+            zip(z["portos"].tolist(), z["portos_capacidade"].tolist())
+        )
+        return RedeCompilada(
+            malha,
+            pos,
+            textos,
+            z["segmentos"],
+            z["segmentos_coords"],
+            capacidade_portos,
+            sha,
+        )
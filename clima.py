@@ -0,0 +1,195 @@
+# Arquivo: clima.py
+
+import json
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from malha import MalhaCompacta
+
+# Intensidade de cada nível: escala os fatores das regras (1 = tabela integral)
+NIVEIS_CHUVA = {"seco": 0.0, "moderada": 0.5, "intensa": 1.0}
+
+# Tabela padrão de chuva (antes fixa no núcleo)
+REGRAS_CHUVA = [
+    # Penalidade leve: rodovias ficam mais lentas
+    {"modal": "road", "fator_peso": 1.1},
+    # Penalidade severa: estradas de terra/precárias viram lama
+    {
+        "modal": "road",
+        "info": ["Não Pavimentada", "Precária", "Rota de Fuga", "Logística Crítica"],
+        "fator_peso": 1.6,  # Custo sobe 60%
+        "fator_falha": 2.5,  # Risco mais que dobra!
+        "teto_falha": 0.95,
+        "sufixo_rotulo": " (LAMA)",
+    },
+]
+
+SELETORES = ("modal", "info", "regiao", "arestas")
+
+
+def regiao_do_no(no: str) -> str:
+    """Região pelo sufixo do nome (Sorriso_MT -> MT); vazio se não houver."""
+    prefixo, separador, sufixo = no.rpartition("_")
+    return sufixo if separador and prefixo else ""
+
+
+def carregar_regras_clima(caminho: str) -> Tuple[List[dict], Dict[str, float]]:
+    """Lê {"regras": [...], "niveis": {...}} de um JSON (níveis opcionais)."""
+    with open(caminho, "r", encoding="utf-8") as f:
+        dados = json.load(f)
+    regras = dados["regras"] if isinstance(dados, dict) else dados
+    niveis = dados.get("niveis") if isinstance(dados, dict) else None
+    return list(regras), dict(niveis or NIVEIS_CHUVA)
+
+
+def _lista(valor) -> list:
+    return [valor] if isinstance(valor, str) else list(valor)
+
+
+class MotorClima:
+    """
+    Penalidades de clima definidas por tabela de regras e aplicadas sobre
+    os arrays da malha CSR, sem passar pelo networkx.
+
+    Cada regra seleciona arestas por modal, classe de pavimento (info),
+    região (de qualquer uma das pontas) e/ou lista explícita de arestas
+    (todos os seletores presentes precisam casar) e então:
+      - fator_peso / fator_falha multiplicam peso e probabilidade de falha
+        (esta limitada por teto_falha);
+      - peso / prob_falha substituem o valor (sobrescrita por aresta);
+      - sufixo_rotulo marca o rótulo exibido no mapa.
+    As regras valem em sequência, na ordem da tabela. A intensidade do nível
+    escala o efeito (fator f vira 1 + (f - 1) * i; sobrescritas interpolam
+    entre o valor atual e o da regra) e intensidade_min liga a regra só a
+    partir de certo nível. As máscaras são calculadas uma vez por seletor,
+    então trocar de nível ou avaliar muitas variantes é só aritmética.
+    """
+
+    def __init__(
+        self,
+        malha: MalhaCompacta,
+        info: Sequence[str],
+        prob_falha: Sequence[float],
+        regioes: Dict[str, str] = None,
+    ):
+        self.malha = malha
+        self.peso_base = malha.peso_base.copy()
+        self.prob_base = np.asarray(prob_falha, dtype=np.float64)
+        self.classes_info, self.info = np.unique(
+            np.asarray(info, dtype=str), return_inverse=True
+        )
+        regioes = regioes or {}
+        self.regiao_no = np.array(
+            [regioes.get(no, regiao_do_no(no)) for no in malha.nos], dtype=object
+        )
+        self._mascaras = {}  # Seletores canônicos -> máscara booleana por aresta
+
+    @classmethod
+    def de_grafo(cls, malha: MalhaCompacta, G, regioes: Dict[str, str] = None):
+        info = [""] * malha.n_arestas
+        prob = np.zeros(malha.n_arestas)
+        for u, v, d in G.edges(data=True):
+            p = malha.posicao_aresta(u, v)
+            info[p] = d.get("info", "")
+            prob[p] = d.get("failure_prob", 0.0)
+        return cls(malha, info, prob, regioes)
+
+    def mascara(self, regra: dict) -> np.ndarray:
+        """Arestas (posições CSR) selecionadas pela regra."""
+        chave = tuple(
+            (
+                (nome, tuple(map(tuple, regra[nome])))
+                if nome == "arestas"
+                else (nome, tuple(_lista(regra[nome])))
+            )
+            for nome in SELETORES
+            if nome in regra
+        )
+        if chave in self._mascaras:
+            return self._mascaras[chave]
+
+        malha = self.malha
+        mascara = np.ones(malha.n_arestas, dtype=bool)
+        for nome, valores in chave:
+            if nome == "modal":
+                codigos = [malha.modais.index(m) for m in valores if m in malha.modais]
+                mascara &= np.isin(malha.modal, codigos)
+            elif nome == "info":
+                mascara &= np.isin(
+                    self.info, np.flatnonzero(np.isin(self.classes_info, valores))
+                )
+            elif nome == "regiao":
+                nos = np.isin(self.regiao_no, valores)
+                mascara &= nos[malha.origem] | nos[malha.destino]
+            else:
+                escolhidas = np.zeros(malha.n_arestas, dtype=bool)
+                for u, v in valores:
+                    par = (malha.indice.get(u), malha.indice.get(v))
+                    if par in malha.posicao:
+                        escolhidas[malha.posicao[par]] = True
+                mascara &= escolhidas
+        self._mascaras[chave] = mascara
+        return mascara
+
+    def avaliar(
+        self, regras: List[dict], intensidades: Sequence[float]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Peso e probabilidade de falha (arestas x intensidades) a partir dos
+        valores base, todas as intensidades de uma só vez.
+        """
+        i = np.asarray(intensidades, dtype=np.float64).reshape(-1)
+        peso = np.repeat(self.peso_base[:, None], len(i), axis=1)
+        prob = np.repeat(self.prob_base[:, None], len(i), axis=1)
+        for regra in regras:
+            ligada = (i > 0) & (i >= regra.get("intensidade_min", 0.0))
+            if not ligada.any():
+                continue
+            m = self.mascara(regra)
+            if not m.any():
+                continue
+            if "fator_peso" in regra:
+                fator = 1 + (regra["fator_peso"] - 1) * i
+                peso[m] *= np.where(ligada, fator, 1.0)
+            if "peso" in regra:
+                alvo = peso[m] + (regra["peso"] - peso[m]) * i
+                peso[m] = np.where(ligada, alvo, peso[m])
+            if "fator_falha" in regra:
+                fator = 1 + (regra["fator_falha"] - 1) * i
+                alvo = np.minimum(regra.get("teto_falha", 1.0), prob[m] * fator)
+                prob[m] = np.where(ligada, alvo, prob[m])
+            if "prob_falha" in regra:
+                alvo = prob[m] + (regra["prob_falha"] - prob[m]) * i
+                prob[m] = np.where(ligada, alvo, prob[m])
+        return peso, prob
+
+    def avaliar_variantes(
+        self, variantes: Sequence[Tuple[List[dict], float]]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Peso e probabilidade (arestas x variantes) de pares (tabela de
+        regras, intensidade): uma passada vetorizada por tabela distinta.
+        """
+        peso = np.empty((self.malha.n_arestas, len(variantes)))
+        prob = np.empty_like(peso)
+        grupos = {}
+        for j, (regras, intensidade) in enumerate(variantes):
+            grupo = grupos.setdefault(id(regras), (regras, [], []))
+            grupo[1].append(j)
+            grupo[2].append(intensidade)
+        for regras, colunas, intensidades in grupos.values():
+            peso[:, colunas], prob[:, colunas] = self.avaliar(regras, intensidades)
+        return peso, prob
+
+    def sufixos(self, regras: List[dict], intensidade: float) -> Dict[int, str]:
+        """Sufixo de rótulo acumulado por posição de aresta nessa intensidade."""
+        sufixos = {}
+        for regra in regras:
+            if "sufixo_rotulo" not in regra or intensidade <= 0:
+                continue
+            if intensidade < regra.get("intensidade_min", 0.0):
+                continue
+            for p in np.flatnonzero(self.mascara(regra)).tolist():
+                sufixos[p] = sufixos.get(p, "") + regra["sufixo_rotulo"]
+        return sufixos
@@ -1,20 +1,38 @@
 # Arquivo: core.py
 
 import networkx as nx
-import matplotlib.pyplot as plt
-import matplotlib.patches as mpatches
-import matplotlib.lines as mlines
-import matplotlib.patheffects as pe
 import numpy as np
-import json
+import math
 import os
 import logging
 import random
 from typing import List, Tuple, Set, Dict
-import copy
+import time
+import weakref
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+from carga import ler_rede
+from clima import NIVEIS_CHUVA, REGRAS_CHUVA, MotorClima
+from dinamica import ArvoreRotas
+from fluxo import planejar_fluxo
+from landmarks import Landmarks, caminho_landmarks
+from malha import MalhaCompacta
+from metricas import Metricas
+from risco import fronteira_pareto, rota_objetivo
+from sazonal import MESES, PerfilSazonal, melhor_janela
 
 logger = logging.getLogger("LogisticsCore")
 CUSTO_TRANSBORDO = 12.50
+PERIODOS_CHUVA_MT = ("Out", "Nov", "Dez", "Jan", "Fev", "Mar", "Abr")
+LAMBDA_RISCO = 100.0  # Custo equivalente a uma unidade de -log(1 - p) na rota
+TAMANHO_CACHE_ROTAS = 256  # Estados (origem, portos, clima, bloqueios) memorizados
+ORIGEM = "Sorriso_MT"  # Origem padrão do painel, do lote, do serviço e do relatório
+DESTINOS = ["Miritituba_PA", "Santos_SP"]
+ERRO_SOMENTE_LEITURA = (
+    "SoyLogisticsNet.graph é somente leitura: use bloquear_aresta, "
+    "desbloquear_aresta, definir_bloqueios, aplicar_nivel_chuva ou grafo_custom"
+)
 
 # --- DESIGN SYSTEM ---
 COLORS = {
@@ -35,143 +53,1153 @@ COLORS = {
 }
 
 
+class _AtributosAresta(dict):
+    """Atributos de aresta do espelho networkx: travados depois da montagem."""
+
+    __slots__ = ("travado",)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.travado = False
+
+    def _escrita(metodo):
+        def alterar(self, *args, **kwargs):
+            if self.travado:
+                raise nx.NetworkXError(ERRO_SOMENTE_LEITURA)
+            return metodo(self, *args, **kwargs)
+
+        return alterar
+
+    __setitem__ = _escrita(dict.__setitem__)
+    __delitem__ = _escrita(dict.__delitem__)
+    clear = _escrita(dict.clear)
+    pop = _escrita(dict.pop)
+    popitem = _escrita(dict.popitem)
+    setdefault = _escrita(dict.setdefault)
+    update = _escrita(dict.update)
+
+
+class _GrafoEspelho(nx.DiGraph):
+    # Cópias (G.copy()) recebem dicts comuns e podem ir em grafo_custom
+    edge_attr_dict_factory = _AtributosAresta
+
+
 class SoyLogisticsNet:
+    """
+    Malha logística com camadas de clima e bloqueio. O roteamento lê a
+    forma CSR (self._malha); self.graph é um espelho networkx somente
+    leitura, montado sob demanda. Alterações passam por bloquear_aresta,
+    desbloquear_aresta, definir_bloqueios e aplicar_nivel_chuva; um grafo
+    editado à parte deve ir em grafo_custom.
+    """
+
     def __init__(self):
-        self.graph = nx.DiGraph()
-        self._initial_graph = None
+        self._grafo = None  # Espelho de self.graph (None = remontar no acesso)
+        self._grafo_base = None  # Grafo networkx do arquivo, montado sob demanda
+        self._textos = {}  # Rótulo/classe de cada aresta, na ordem da malha CSR
+        self._malha = None  # Forma CSR usada pelo roteamento e pela simulação
+        self._caminho_dados = None
+        self._landmarks = None  # Pré-processamento ALT opcional (preparar_landmarks)
+        self._landmarks_validos = None  # Cache de Landmarks.valido_para
+        self._arvore = None  # Árvore de rotas reparada incrementalmente
         self.pos = {}
-        self.modo_chuva = False  # Estado do clima
+        self.origens = [ORIGEM]  # Pontos de coleta destacados no mapa
+        self.capacidade_portos = {}  # Limite de recepção (t/dia) por porto
+        self.modo_chuva = False  # Estado do clima (algum nível de chuva ativo)
+        self.nivel_chuva = "seco"
+        self.regras_clima = REGRAS_CHUVA  # Tabela de regras (ver clima.MotorClima)
+        self.niveis_chuva = dict(NIVEIS_CHUVA)  # Nível -> intensidade
+        self._versao_clima = 0  # Muda a cada troca de tabela de regras
+        self._motor_clima = None
+        self._camadas_clima = {}  # Nível -> (peso, prob_falha) calculados
+        self._overlays_clima = {}  # Nível -> overlay networkx, montado sob demanda
+        self._camada_ativa = None  # (peso, prob_falha) aplicados na malha
+        self.arestas_bloqueadas = set()  # Camada de bloqueios manuais
+        self._hash_dados = None  # Impressão digital do arquivo carregado
+        self._cache_rotas = OrderedDict()  # LRU: estado canônico -> tabela
+        self._cache_capacidade = TAMANHO_CACHE_ROTAS
+        self._cache_hits = 0
+        self._cache_misses = 0
+        self._camadas_render = weakref.WeakKeyDictionary()  # Eixo -> camadas retidas
+        self.tempos_quadros = deque(maxlen=500)  # Segundos por quadro renderizado
+        self.metricas = (
+            Metricas()
+        )  # Spans de tempo e contadores (ver snapshot_metricas)
 
-    def carregar_dados(self, json_path: str):
+    def carregar_dados(self, json_path: str, usar_cache: bool = True):
+        """
+        Carrega a malha (.json, .jsonl ou .csv; ver carga.ler_rede). Com
+        usar_cache, um .npz compilado ao lado do arquivo evita reprocessar
+        a origem enquanto ela não mudar.
+        """
         logger.info(f"Carregando dados: {json_path}")
         if not os.path.exists(json_path):
             raise FileNotFoundError(f"{json_path} não encontrado.")
 
-        with open(json_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-
-        self.pos = {k: tuple(v) for k, v in data["nodes"].items()}
-        self.graph.clear()
-        for edge in data["edges"]:
-            self.graph.add_edge(
-                edge["u"],
-                edge["v"],
-                weight=edge["weight"],
-                distance=edge["distance"],
-                label=edge["label"],
-                info=edge["info"],
-                type=edge["type"],
-                failure_prob=edge.get("failure_prob", 0.0),
+        span = self.metricas.span
+        with span("carga"):
+            with span("carga.leitura"):
+                rede = ler_rede(json_path, usar_cache)
+            self._hash_dados = rede.sha
+            self.limpar_cache_rotas()
+            self._caminho_dados = json_path
+            self._landmarks = None
+            origem_acompanhada = (
+                self._malha.nos[self._arvore.origem] if self._arvore else None
             )
-        self._initial_graph = copy.deepcopy(self.graph)
+            self._arvore = None
+
+            self.pos = rede.pos
+            self.capacidade_portos = rede.capacidade_portos
+            self._textos = rede.textos
+            self._grafo_base = None  # O networkx só é montado se alguém o pedir
+            self._grafo = None
+            with span("carga.malha"):
+                if self._malha is not None:
+                    self._acumular_contadores(self._malha)
+                self._malha = rede.malha
+            self.modo_chuva = False
+            self.nivel_chuva = "seco"
+            self.arestas_bloqueadas = set()
+            self._camada_ativa = None
+            with span("carga.clima"):
+                self._motor_clima = MotorClima(
+                    self._malha, self._textos["info"], self._malha.prob_falha.copy()
+                )
+                self._camadas_clima = {}
+                self._overlays_clima = {}
+                self._camada_clima(self.nivel_chuva_maximo())
+            with span("carga.indice_espacial"):
+                self._construir_indice_espacial(rede.segmentos, rede.coords)
+            if origem_acompanhada:
+                self.acompanhar_origem(origem_acompanhada)
+
+    def _camada_clima(self, nivel: str):
+        """(peso, prob_falha) do nível, calculados uma vez pelo motor de regras."""
+        camada = self._camadas_clima.get(nivel)
+        if camada is not None:
+            return camada
+        if nivel not in self.niveis_chuva:
+            raise ValueError(f"Nível de chuva desconhecido: {nivel}")
+        peso, prob = self._motor_clima.avaliar(
+            self.regras_clima, [self.niveis_chuva[nivel]]
+        )
+        camada = self._camadas_clima[nivel] = (peso[:, 0], prob[:, 0])
+        return camada
+
+    @property
+    def _overlay_clima(self) -> dict:
+        """
+        {(u, v): atributos alterados} do nível ativo, para o espelho networkx
+        e o desenho. Montado só quando um deles pede: o roteamento usa apenas
+        os arrays da camada.
+        """
+        nivel = self.nivel_chuva
+        overlay = self._overlays_clima.get(nivel)
+        if overlay is not None:
+            return overlay
+        motor, malha = self._motor_clima, self._malha
+        peso, prob = self._camada_clima(nivel)
+        sufixos = motor.sufixos(self.regras_clima, self.niveis_chuva[nivel])
+        rotulos = self._textos["label"]
+
+        overlay = {}
+        peso_mudou = peso != motor.peso_base
+        prob_mudou = prob != motor.prob_base
+        alteradas = np.flatnonzero(peso_mudou | prob_mudou).tolist()
+        for p in sorted(set(alteradas) | sufixos.keys()):
+            u, v = malha.nos[malha._origem[p]], malha.nos[malha._destino[p]]
+            alterado = {"weight": float(peso[p])}
+            if prob_mudou[p]:
+                alterado["failure_prob"] = float(prob[p])
+            if p in sufixos:
+                alterado["label"] = str(rotulos[p]) + sufixos[p]
+            overlay[(u, v)] = alterado
+        self._overlays_clima[nivel] = overlay
+        return overlay
+
+    @property
+    def _initial_graph(self) -> nx.DiGraph:
+        """
+        Grafo base do arquivo (sem clima nem bloqueios) em networkx, montado
+        a partir da malha no primeiro uso (desenho, espelho self.graph).
+        """
+        if self._grafo_base is None and self._malha is not None:
+            malha = self._malha
+            colunas = {
+                "weight": malha.peso_base.tolist(),
+                "distance": malha.distancia.tolist(),
+                "label": self._textos["label"].tolist(),
+                "info": self._textos["info"].tolist(),
+                "type": [malha.modais[m] for m in malha._modal],
+                "failure_prob": self._motor_clima.prob_base.tolist(),
+            }
+            capacidade = malha.capacidade.tolist()
+            G = nx.DiGraph()
+            G.add_nodes_from(malha.nos)
+            for p, (u, v) in enumerate(self.arestas()):
+                atributos = {campo: coluna[p] for campo, coluna in colunas.items()}
+                if capacidade[p] != float("inf"):  # Sem capacidade = ilimitada
+                    atributos["capacity"] = capacidade[p]
+                G.add_edge(u, v, **atributos)
+            self._grafo_base = G
+        return self._grafo_base
+
+    def arestas(self) -> List[Tuple[str, str]]:
+        """Arestas (u, v) do grafo base, na ordem da malha CSR."""
+        malha = self._malha
+        nos = malha.nos
+        return [
+            (nos[u], nos[v])
+            for u, v in zip(malha.origem.tolist(), malha.destino.tolist())
+        ]
+
+    @property
+    def graph(self) -> nx.DiGraph:
+        """
+        Espelho networkx do estado atual (grafo base + clima - bloqueios),
+        montado no primeiro acesso depois de cada mudança. É congelado:
+        adicionar/remover arestas ou alterar atributos levanta NetworkXError,
+        já que o roteamento só lê a malha CSR.
+        """
+        if self._grafo is None:
+            G = _GrafoEspelho()
+            if self._initial_graph is not None:
+                G.add_nodes_from(self._initial_graph)
+                G.add_edges_from(
+                    (u, v, self._atributos_aresta(u, v, self._overlay_clima))
+                    for u, v in self._initial_graph.edges()
+                    if (u, v) not in self.arestas_bloqueadas
+                )
+                for _, _, dados in G.edges(data=True):
+                    dados.travado = True
+            self._grafo = nx.freeze(G)
+        return self._grafo
+
+    def _atributos_aresta(self, u: str, v: str, overlay: dict) -> dict:
+        """Atributos efetivos de uma aresta: grafo base + camada informada."""
+        atributos = dict(self._initial_graph[u][v])
+        atributos.update(overlay.get((u, v), {}))
+        return atributos
+
+    def nivel_chuva_maximo(self) -> str:
+        """Nível de maior intensidade da tabela atual ("intensa" no padrão)."""
+        return max(self.niveis_chuva, key=self.niveis_chuva.get)
 
     def aplicar_condicoes_climaticas(self, chuva_intensa: bool):
+        """Liga (nível mais intenso) ou desliga (nível "seco") a camada de chuva."""
+        self.aplicar_nivel_chuva(self.nivel_chuva_maximo() if chuva_intensa else "seco")
+
+    def aplicar_nivel_chuva(self, nivel: str):
         """
-        Reconstroi o grafo aplicando penalidades de chuva se necessário.
-        """
-        self.modo_chuva = chuva_intensa
-        # Reset para o estado original (limpo)
-        self.graph = copy.deepcopy(self._initial_graph)
-
-        if chuva_intensa:
-            logger.warning("CLIMA: Aplicando penalidades de Chuva Intensa!")
-            for u, v, d in self.graph.edges(data=True):
-                # Penalidade apenas para Rodovias
-                if d.get("type") == "road":
-                    # Penalidade Leve (Estradas normais ficam mais lentas)
-                    d["weight"] *= 1.1
-
-                    # Penalidade Severa (Estradas de terra/precárias)
-                    if d.get("info") in [
-                        "Não Pavimentada",
-                        "Precária",
-                        "Rota de Fuga",
-                        "Logística Crítica",
-                    ]:
-                        d["weight"] *= 1.6  # Custo sobe 60%
-                        d["failure_prob"] = min(
-                            0.95, d.get("failure_prob", 0) * 2.5
-                        )  # Risco mais que dobra!
-                        d["label"] += " (LAMA)"
+        Aplica (ou reverte) um nível de chuva sobre o grafo de trabalho. Os
+        buffers da malha recebem os arrays do nível de uma vez; o overlay
+        networkx só é montado se o espelho ou o desenho o pedirem. Bloqueios
+        manuais são preservados.
+        """
+        camada = self._camada_clima(nivel)
+        self.nivel_chuva = nivel
+        self.modo_chuva = self.niveis_chuva[nivel] > 0
+        if camada is self._camada_ativa:
+            return
+
+        if self.modo_chuva:
+            logger.warning(f"CLIMA: Aplicando penalidades de chuva ({nivel})!")
+        with self.metricas.span("clima"):
+            malha = self._malha
+            peso, prob = camada
+            alteradas = np.flatnonzero(
+                (malha.peso != peso) | (malha.prob_falha != prob)
+            )
+            malha.peso[:] = peso
+            malha.prob_falha[:] = prob
+            self._camada_ativa = camada
+            self._grafo = None
+        self._landmarks_validos = None
+        self._reparar_arvore(alteradas.tolist())
+        self.metricas.contar("clima.arestas_atualizadas", len(alteradas))
+
+    def definir_regras_clima(self, regras: List[dict], niveis: Dict[str, float] = None):
+        """
+        Troca a tabela de regras (e, opcionalmente, os níveis) e reaplica o
+        nível atual, ou "seco" se ele deixar de existir.
+        """
+        niveis = dict(niveis or self.niveis_chuva)
+        if "seco" not in niveis:
+            niveis["seco"] = 0.0
+        self.regras_clima = list(regras)
+        self.niveis_chuva = niveis
+        self._versao_clima += 1
+        self._camadas_clima = {}
+        self._overlays_clima = {}
+        self.limpar_cache_rotas()
+        if self._malha is not None:
+            nivel = self.nivel_chuva if self.nivel_chuva in niveis else "seco"
+            self.aplicar_nivel_chuva(nivel)
+
+    def perfil_clima(self, variantes: Dict[str, object] = None) -> PerfilSazonal:
+        """
+        Perfil arestas x variantes de clima, calculado só sobre os arrays da
+        malha (sem networkx). Cada variante é uma intensidade da tabela atual
+        ou um par (regras, intensidade); padrão: os níveis de chuva. Serve
+        direto para buscar_melhor_janela, com as variantes no lugar dos
+        períodos.
+        """
+        variantes = self.niveis_chuva if variantes is None else variantes
+        pares = [
+            v if isinstance(v, tuple) else (self.regras_clima, v)
+            for v in variantes.values()
+        ]
+        with self.metricas.span("clima.variantes"):
+            peso, prob = self._motor_clima.avaliar_variantes(pares)
+        return PerfilSazonal(list(variantes), peso, prob)
+
+    def bloquear_aresta(self, u: str, v: str):
+        """Tira a aresta da malha de trabalho, mantendo-a no grafo base."""
+        malha = self._malha
+        existe = (malha.indice.get(u), malha.indice.get(v)) in malha.posicao
+        if existe and (u, v) not in self.arestas_bloqueadas:
+            self.arestas_bloqueadas.add((u, v))
+            malha.definir_ativa(u, v, False)
+            self._reparar_arvore([malha.posicao_aresta(u, v)])
+            self._grafo = None
+
+    def desbloquear_aresta(self, u: str, v: str):
+        """Restaura a aresta com os atributos do clima atual."""
+        if (u, v) in self.arestas_bloqueadas:
+            self.arestas_bloqueadas.discard((u, v))
+            self._malha.definir_ativa(u, v, True)
+            self._reparar_arvore([self._malha.posicao_aresta(u, v)])
+            self._grafo = None
+
+    def acompanhar_origem(self, origem: str):
+        """
+        Mantém uma árvore de caminhos mínimos a partir da origem (ver
+        dinamica.ArvoreRotas). Bloqueios, desbloqueios e mudanças de clima
+        passam a reparar só a parte afetada, e as consultas dessa origem
+        saem direto da árvore. None desliga o acompanhamento.
+        """
+        self._arvore = None
+        if origem is None or origem not in self._malha.indice:
+            return None
+        with self.metricas.span("arvore.construcao"):
+            self._arvore = ArvoreRotas(
+                self._malha, self._malha.indice[origem], CUSTO_TRANSBORDO
+            )
+        return self._arvore
+
+    def _reparar_arvore(self, posicoes):
+        if self._arvore is None:
+            return
+        with self.metricas.span("arvore.reparo"):
+            assentados = self._arvore.atualizar(posicoes)
+        self.metricas.contar("arvore.estados_reparados", assentados)
+
+    def definir_bloqueios(self, arestas: Set[Tuple[str, str]]):
+        """Sincroniza a camada de bloqueios alterando apenas a diferença."""
+        alvo = set(arestas)
+        for u, v in self.arestas_bloqueadas - alvo:
+            self.desbloquear_aresta(u, v)
+        for u, v in alvo - self.arestas_bloqueadas:
+            self.bloquear_aresta(u, v)
 
     def _calcular_custo_manual(self, caminho: List[str]):
         if not self.graph:
             return 0
-        custo = 0
-        modal_ant = None
-        for i in range(len(caminho) - 1):
-            u, v = caminho[i], caminho[i + 1]
-            dados = self.graph[u][v]
-            custo += dados["weight"]
-            modal_atual = dados.get("type", "road")
-            if modal_ant and modal_ant != modal_atual:
-                custo += CUSTO_TRANSBORDO
-            modal_ant = modal_atual
+        with self.metricas.span("custo"):
+            custo = 0
+            modal_ant = None
+            for i in range(len(caminho) - 1):
+                u, v = caminho[i], caminho[i + 1]
+                dados = self.graph[u][v]
+                custo += dados["weight"]
+                modal_atual = dados.get("type", "road")
+                if modal_ant and modal_ant != modal_atual:
+                    custo += CUSTO_TRANSBORDO
+                modal_ant = modal_atual
         return custo
 
-    def buscar_melhor_rota(self, origem: str, destinos: List[str], grafo_custom=None):
-        G = grafo_custom if grafo_custom else self.graph
+    def avaliar_caminhos(self, caminhos) -> Dict[str, np.ndarray]:
+        """
+        Versão em lote de _calcular_custo_manual: caminhos como listas de
+        nomes (tamanhos livres) ou matriz de ids da malha completada com -1.
+        Ver MalhaCompacta.avaliar_caminhos para os arrays devolvidos.
+        """
+        malha = self._malha
+        if not isinstance(caminhos, np.ndarray):
+            caminhos = malha.matriz_caminhos(
+                [[malha.indice.get(no, -2) for no in c] for c in caminhos]
+            )
+        with self.metricas.span("custo.lote"):
+            return malha.avaliar_caminhos(caminhos, CUSTO_TRANSBORDO)
+
+    def _tabela_malha(
+        self, malha: MalhaCompacta, origem: str, destinos: List[str], ativa=None
+    ):
+        """
+        Roda o Dijkstra modal da malha CSR e traduz ids para nomes.
+        Portos inalcançáveis (ou fora da malha) ficam com (inf, []).
+        """
+        tabela = {destino: (float("inf"), []) for destino in destinos}
+        if origem not in malha.indice:
+            return tabela
+        alvos = [malha.indice[d] for d in destinos if d in malha.indice]
+        arvore = self._arvore
+        if (
+            arvore is not None
+            and malha is arvore.malha
+            and ativa is None
+            and malha.indice[origem] == arvore.origem
+        ):
+            # Árvore já reparada: cada porto é só a leitura do caminho
+            for no in alvos:
+                custo, caminho = arvore.rota(no)
+                if caminho:
+                    tabela[malha.nos[no]] = (custo, [malha.nos[i] for i in caminho])
+            return tabela
+        potencial = None
+        if alvos and malha is self._malha and self._landmarks_utilizaveis():
+            potencial = self._landmarks.potencial(alvos)
+            self.metricas.contar("busca.alt")
+        resultado = malha.dijkstra_modal(
+            malha.indice[origem], alvos, CUSTO_TRANSBORDO, ativa, potencial=potencial
+        )
+        for no, (custo, caminho) in resultado.items():
+            tabela[malha.nos[no]] = (custo, [malha.nos[i] for i in caminho])
+        return tabela
+
+    def preparar_landmarks(self, n_landmarks: int = 8, usar_cache: bool = True):
+        """
+        Pré-processamento ALT para consultas repetidas origem -> portos (ver
+        landmarks.Landmarks). Gravado em <arquivo>.alt.npz e reaproveitado
+        enquanto o hash dos dados for o mesmo.
+        """
+        caminho = caminho_landmarks(self._caminho_dados)
+        landmarks = None
+        if usar_cache:
+            try:
+                landmarks = Landmarks.carregar(caminho, self._hash_dados, n_landmarks)
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Landmarks ignorados ({caminho}): {e}")
+        if landmarks is None:
+            with self.metricas.span("landmarks.construcao"):
+                landmarks = Landmarks.construir(
+                    self._malha, n_landmarks, self._hash_dados
+                )
+            if usar_cache:
+                try:
+                    landmarks.salvar(caminho)
+                except OSError as e:
+                    logger.warning(f"Não foi possível gravar os landmarks: {e}")
+        self._landmarks = landmarks
+        self._landmarks_validos = None
+        logger.info(f"Landmarks ALT prontos: {len(landmarks.marcos)} marcos")
+        return landmarks
+
+    def _landmarks_utilizaveis(self) -> bool:
+        # Bloqueios e chuva mantêm os limites válidos; pesos abaixo do base não
+        if self._landmarks is None:
+            return False
+        if self._landmarks_validos is None:
+            self._landmarks_validos = self._landmarks.valido_para(self._malha)
+            if not self._landmarks_validos:
+                logger.info("Landmarks desativados: pesos abaixo do pré-processamento")
+        return self._landmarks_validos
+
+    @staticmethod
+    def _melhor_da_tabela(tabela, destinos: List[str]):
         melhor_custo = float("inf")
         melhor_caminho = []
         for destino in destinos:
-            if destino not in G:
-                continue
-            try:
-                if nx.has_path(G, origem, destino):
-                    caminhos = nx.all_simple_paths(G, source=origem, target=destino)
-                    for caminho in caminhos:
-                        custo = self._calcular_custo_manual(caminho)
-                        if custo < melhor_custo:
-                            melhor_custo = custo
-                            melhor_caminho = caminho
-            except:
-                pass
+            custo, caminho = tabela[destino]
+            if custo < melhor_custo:
+                melhor_custo = custo
+                melhor_caminho = caminho
         return melhor_custo, melhor_caminho
 
-    def _find_closest_edge(self, x_click, y_click, tolerance=0.8):
-        min_distance = float("inf")
-        closest_edge = None
-        for u, v in self.graph.edges():  # Usa self.graph para pegar o estado atual
-            if u not in self.pos or v not in self.pos:
-                continue
-            x1, y1 = self.pos[u]
-            x2, y2 = self.pos[v]
-            dx, dy = x2 - x1, y2 - y1
-            if dx == 0 and dy == 0:
+    def limpar_cache_rotas(self):
+        """Descarta todas as rotas memorizadas (ex.: ao carregar novos dados)."""
+        self._cache_rotas.clear()
+
+    def estatisticas_cache(self) -> Dict[str, int]:
+        """Contadores do cache de rotas."""
+        return {
+            "hits": self._cache_hits,
+            "misses": self._cache_misses,
+            "tamanho": len(self._cache_rotas),
+            "capacidade": self._cache_capacidade,
+        }
+
+    def _tabela_rotas(self, G, origem: str, destinos: List[str]):
+        """
+        Tabela {porto: (custo, caminho)} com cache LRU no estado canônico
+        (origem, portos, clima, bloqueios, hash dos dados). G=None é a malha
+        de trabalho (única com cache); um grafo avulso é compactado na hora.
+        """
+        chave = None
+        if G is None:
+            chave = (
+                origem,
+                frozenset(destinos),
+                self.nivel_chuva,
+                frozenset(self.arestas_bloqueadas),
+                self._hash_dados,
+            )
+            if chave in self._cache_rotas:
+                self._cache_hits += 1
+                self._cache_rotas.move_to_end(chave)
+                return self._copiar_tabela(self._cache_rotas[chave], destinos)
+            self._cache_misses += 1
+
+        with self.metricas.span("roteamento"):
+            malha = self._malha if G is None else MalhaCompacta.de_grafo(G)
+            tabela = self._tabela_malha(malha, origem, destinos)
+        if malha is not self._malha:
+            self._acumular_contadores(malha)
+
+        if chave is not None:
+            self._cache_rotas[chave] = self._copiar_tabela(tabela, destinos)
+            if len(self._cache_rotas) > self._cache_capacidade:
+                self._cache_rotas.popitem(last=False)
+        return tabela
+
+    def _acumular_contadores(self, malha: MalhaCompacta):
+        """Transfere o trabalho das buscas da malha para as métricas."""
+        for nome, valor in malha.contadores.items():
+            self.metricas.contar(f"busca.{nome}", valor)
+            malha.contadores[nome] = 0
+
+    def snapshot_metricas(self) -> Dict[str, dict]:
+        """
+        Estado da instrumentação: spans (chamadas, total/médio/máx em ms),
+        contadores (buscas, estados explorados, arestas relaxadas, ...) e
+        o cache de rotas.
+        """
+        if self._malha is not None:
+            self._acumular_contadores(self._malha)
+        snapshot = self.metricas.snapshot()
+        snapshot["cache_rotas"] = self.estatisticas_cache()
+        return snapshot
+
+    def zerar_metricas(self):
+        if self._malha is not None:
+            self._acumular_contadores(self._malha)
+        self.metricas.zerar()
+
+    @staticmethod
+    def _copiar_tabela(tabela, destinos):
+        # Cópia defensiva: quem chama pode alterar os caminhos devolvidos
+        return {d: (tabela[d][0], list(tabela[d][1])) for d in destinos}
+
+    def buscar_rotas_por_porto(
+        self, origem: str, destinos: List[str], grafo_custom=None
+    ):
+        """
+        Busca única a partir da origem para todos os portos solicitados.
+        Retorna (melhor_custo, melhor_caminho, tabela), onde a tabela mapeia
+        cada porto para (custo, caminho); portos inalcançáveis ficam com
+        (inf, []). Um grafo editado à parte (ex.: self.graph.copy()) vai em
+        grafo_custom.
+        """
+        tabela = self._tabela_rotas(grafo_custom or None, origem, destinos)
+        melhor_custo, melhor_caminho = self._melhor_da_tabela(tabela, destinos)
+        return melhor_custo, melhor_caminho, tabela
+
+    def buscar_melhor_rota(self, origem: str, destinos: List[str], grafo_custom=None):
+        melhor_custo, melhor_caminho, _ = self.buscar_rotas_por_porto(
+            origem, destinos, grafo_custom
+        )
+        return melhor_custo, melhor_caminho
+
+    def matriz_custos(
+        self, origens: List[str], portos: List[str]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Matriz origens x portos de custos modais (inf = sem rota) e, por
+        origem, o índice do porto mais barato (-1 = nenhum). Uma busca reversa
+        por porto atende todas as origens de uma vez.
+        """
+        malha = self._malha
+        matriz = np.full((len(origens), len(portos)), np.inf)
+        ids = [malha.indice.get(o) for o in origens]
+        alvos = [i for i in ids if i is not None]
+        for j, porto in enumerate(portos):
+            if porto not in malha.indice or not alvos:
                 continue
-            t = max(
-                0,
-                min(
-                    1, ((x_click - x1) * dx + (y_click - y1) * dy) / (dx * dx + dy * dy)
-                ),
+            custos = malha.custos_ate(malha.indice[porto], alvos, CUSTO_TRANSBORDO)
+            for i, no in enumerate(ids):
+                if no in custos:
+                    matriz[i, j] = custos[no]
+
+        melhores = np.full(len(origens), -1, dtype=np.intp)
+        if portos:
+            alcancaveis = np.isfinite(matriz).any(axis=1)
+            melhores[alcancaveis] = matriz[alcancaveis].argmin(axis=1)
+        return matriz, melhores
+
+    def planejar_fluxo(self, origem: str, portos: List[str], volume: float) -> dict:
+        """
+        Distribui `volume` toneladas entre rotas e portos por fluxo de custo
+        mínimo, respeitando `capacity` das arestas e `port_capacity` dos portos
+        (ver fluxo.planejar_fluxo). As rotas voltam com nomes de nós.
+        """
+        malha = self._malha
+        portos = [p for p in portos if p in malha.indice]
+        if origem not in malha.indice or not portos:
+            return {
+                "volume": volume,
+                "alocado": 0.0,
+                "nao_alocado": volume,
+                "custo_total": 0.0,
+                "rotas": [],
+            }
+        plano = planejar_fluxo(
+            malha,
+            malha.indice[origem],
+            [malha.indice[p] for p in portos],
+            volume,
+            CUSTO_TRANSBORDO,
+            {
+                malha.indice[p]: cap
+                for p, cap in self.capacidade_portos.items()
+                if p in malha.indice
+            },
+        )
+        for rota in plano["rotas"]:
+            rota["caminho"] = [malha.nos[i] for i in rota["caminho"]]
+        return plano
+
+    def perfil_sazonal(
+        self,
+        periodos: List[str] = MESES,
+        periodos_chuva=PERIODOS_CHUVA_MT,
+        periodos_safra=(),
+        fator_safra: float = 1.0,
+    ) -> PerfilSazonal:
+        """
+        Perfil arestas x períodos a partir do grafo base: nos períodos de
+        chuva vale o nível "intensa" da tabela de regras de clima, e no pico
+        de safra as rodovias são multiplicadas por fator_safra.
+        """
+        malha = self._malha
+        intensa = self.niveis_chuva.get("intensa", 1.0)
+        (peso_base, peso_chuva), (prob_base, prob_chuva) = (
+            m.T for m in self._motor_clima.avaliar(self.regras_clima, [0.0, intensa])
+        )
+
+        chuva = np.isin(periodos, list(periodos_chuva))
+        peso = np.where(chuva, peso_chuva[:, None], peso_base[:, None])
+        prob_falha = np.where(chuva, prob_chuva[:, None], prob_base[:, None])
+        if "road" in malha.modais:
+            rodovia = malha.modal == malha.modais.index("road")
+            safra = np.isin(periodos, list(periodos_safra))
+            peso[np.ix_(rodovia, safra)] *= fator_safra
+        return PerfilSazonal(periodos, peso, prob_falha)
+
+    def buscar_melhor_janela(
+        self, origem: str, destinos: List[str], perfil: PerfilSazonal = None
+    ) -> dict:
+        """
+        Melhor rota por período do horizonte e a janela de saída mais barata
+        (ver sazonal.melhor_janela). Bloqueios atuais continuam valendo.
+        """
+        malha = self._malha
+        perfil = perfil or self.perfil_sazonal()
+        alvos = [malha.indice[d] for d in destinos if d in malha.indice]
+        if origem not in malha.indice or not alvos:
+            T = len(perfil.periodos)
+            return {
+                "periodos": perfil.periodos,
+                "custos": np.full(T, np.inf),
+                "caminhos": [[] for _ in range(T)],
+                "prob_falha": np.ones(T),
+                "melhor_periodo": None,
+                "melhor_custo": float("inf"),
+                "melhor_caminho": [],
+            }
+        janela = melhor_janela(
+            malha, perfil, malha.indice[origem], alvos, CUSTO_TRANSBORDO
+        )
+        janela["caminhos"] = [[malha.nos[i] for i in c] for c in janela["caminhos"]]
+        janela["melhor_caminho"] = [malha.nos[i] for i in janela["melhor_caminho"]]
+        return janela
+
+    def buscar_k_melhores_rotas(
+        self,
+        origem: str,
+        destinos: List[str],
+        k: int = 3,
+        disjuntas: bool = False,
+        max_sobreposicao: float = None,
+        grafo_custom=None,
+    ) -> List[Tuple[float, List[str]]]:
+        """
+        Até k rotas alternativas [(custo, caminho)], em custo crescente e já
+        com transbordos, para planos de contingência (ex.: Arco Norte x
+        Corredor Sul). Ver MalhaCompacta.k_melhores para as restrições de
+        diversidade.
+        """
+        malha = MalhaCompacta.de_grafo(grafo_custom) if grafo_custom else self._malha
+        if origem not in malha.indice:
+            return []
+        alvos = [malha.indice[d] for d in destinos if d in malha.indice]
+        rotas = malha.k_melhores(
+            malha.indice[origem],
+            alvos,
+            k,
+            CUSTO_TRANSBORDO,
+            disjuntas=disjuntas,
+            max_sobreposicao=max_sobreposicao,
+        )
+        return [(custo, [malha.nos[i] for i in caminho]) for custo, caminho in rotas]
+
+    def _nomear_rota(self, rota: dict) -> dict:
+        rota["caminho"] = [self._malha.nos[i] for i in rota["caminho"]]
+        rota["porto"] = rota["caminho"][-1] if rota["caminho"] else None
+        return rota
+
+    def buscar_rota_segura(
+        self,
+        origem: str,
+        destinos: List[str],
+        objetivo: str = "risco",
+        lambda_risco: float = LAMBDA_RISCO,
+    ) -> dict:
+        """
+        Rota que considera a probabilidade de falha dos trechos (clima e
+        bloqueios atuais valem): "esperado" (custo com repetição dos trechos
+        que falham), "risco" (custo + lambda * -log(1 - p)), "confiabilidade"
+        (máxima probabilidade de chegar) ou "custo". Ver risco.pesos_objetivo.
+        Devolve custo real, prob_falha, confiabilidade, caminho, porto e o
+        valor do objetivo.
+        """
+        malha = self._malha
+        alvos = [malha.indice[d] for d in destinos if d in malha.indice]
+        if origem not in malha.indice or not alvos:
+            return {
+                "custo": float("inf"),
+                "prob_falha": 1.0,
+                "confiabilidade": 0.0,
+                "caminho": [],
+                "porto": None,
+                "objetivo": objetivo,
+                "valor": float("inf"),
+            }
+        with self.metricas.span("roteamento.risco"):
+            rota = rota_objetivo(
+                malha,
+                malha.indice[origem],
+                alvos,
+                CUSTO_TRANSBORDO,
+                objetivo,
+                lambda_risco,
+            )
+        return self._nomear_rota(rota)
+
+    def fronteira_risco(
+        self, origem: str, destinos: List[str], max_rotas: int = 16
+    ) -> List[dict]:
+        """
+        Opções não dominadas de custo x confiabilidade, da mais barata à
+        mais segura (ver risco.fronteira_pareto): um Dijkstra por ponto.
+        """
+        malha = self._malha
+        alvos = [malha.indice[d] for d in destinos if d in malha.indice]
+        if origem not in malha.indice or not alvos:
+            return []
+        with self.metricas.span("roteamento.fronteira"):
+            rotas = fronteira_pareto(
+                malha, malha.indice[origem], alvos, CUSTO_TRANSBORDO, max_rotas
+            )
+        return [self._nomear_rota(rota) for rota in rotas]
+
+    def ranking_criticidade(
+        self,
+        origem: str,
+        destinos: List[str],
+        top_pares: int = 10,
+        candidatas_pares: int = 10,
+    ) -> dict:
+        """
+        Quanto o melhor custo origem -> portos sobe ao remover cada aresta
+        (e os piores pares de arestas). Só arestas da rota ótima alteram o
+        custo: a árvore de caminhos mínimos da origem (dinamica.ArvoreRotas)
+        é montada uma vez e, para cada uma delas, só a subárvore que ela
+        desconecta é reparada. Os pares combinam as candidatas_pares arestas
+        de maior aumento com as da rota alternativa de cada uma. Pontes (sem
+        rota alternativa) ficam fora dos pares: qualquer par com elas também
+        desconecta a origem dos portos.
+        """
+        malha = self._malha
+        custo_base, caminho_base = self.buscar_melhor_rota(origem, destinos)
+        if not caminho_base:
+            return {"custo_base": custo_base, "arestas": [], "pares": []}
+        alvos = [malha.indice[d] for d in destinos if d in malha.indice]
+
+        @contextmanager
+        def _sem(posicoes):
+            # Tira as arestas da malha só enquanto a árvore reparada é consultada
+            for p in posicoes:
+                malha._ativa[p] = False
+            try:
+                with arvore.provisoria():
+                    arvore.atualizar(posicoes)
+                    yield arvore.melhor_rota(alvos)
+            finally:
+                for p in posicoes:
+                    malha._ativa[p] = True
+
+        def _linha(posicoes, custo):
+            arestas = [
+                (malha.nos[malha.origem[p]], malha.nos[malha.destino[p]])
+                for p in posicoes
+            ]
+            aumento = custo - custo_base
+            return {
+                "arestas": arestas,
+                "rotulos": [str(self._textos["label"][p]) for p in posicoes],
+                "custo": custo,
+                "aumento": aumento,
+                "aumento_pct": aumento / custo_base * 100 if custo_base else 0.0,
+            }
+
+        with self.metricas.span("criticidade"):
+            arvore = ArvoreRotas(malha, malha.indice[origem], CUSTO_TRANSBORDO)
+            custo_base, trechos_base = arvore.melhor_rota(alvos)
+            alternativas = {}
+            for p in trechos_base:
+                with _sem([p]) as alternativa:
+                    alternativas[p] = alternativa
+            arestas = [
+                _linha([p], alternativas.get(p, (custo_base,))[0])
+                for p in np.flatnonzero(malha.ativa).tolist()
+            ]
+
+            candidatas = sorted(
+                (p for p, (custo, _) in alternativas.items() if custo < float("inf")),
+                key=lambda p: -alternativas[p][0],
+            )[:candidatas_pares]
+            pares, vistos = [], set()
+            for p1 in candidatas:
+                with _sem([p1]) as (_, trechos_alt):
+                    for p2 in trechos_alt:
+                        chave = frozenset((p1, p2))
+                        if chave in vistos:
+                            continue
+                        vistos.add(chave)
+                        with _sem([p2]) as (custo, _):
+                            pares.append(_linha(sorted(chave), custo))
+
+        arestas.sort(key=lambda linha: -linha["aumento"])
+        pares.sort(key=lambda linha: -linha["aumento"])
+        return {
+            "custo_base": custo_base,
+            "arestas": arestas,
+            "pares": pares[:top_pares],
+        }
+
+    def simular_falhas(
+        self,
+        origem: str,
+        destinos: List[str],
+        n_amostras: int = 10000,
+        semente=None,
+    ) -> dict:
+        """Monte Carlo exato de interrupções pela failure_prob (com o clima atual)."""
+        malha = self._malha
+        n_arestas = malha.n_arestas
+        rng = np.random.default_rng(semente)
+        # Falhas em bits, amostras x arestas (uma linha contígua por amostra).
+        # O sorteio vai em blocos de arestas, na mesma sequência da matriz
+        # arestas x amostras inteira, sem alocá-la em float64.
+        falhas = np.zeros((n_amostras, (n_arestas + 7) // 8), dtype=np.uint8)
+        bloco = max(8, (1 << 22) // max(n_amostras, 1) // 8 * 8)
+        for inicio in range(0, n_arestas, bloco):
+            fim = min(inicio + bloco, n_arestas)
+            sorteio = rng.random((fim - inicio, n_amostras))
+            sorteio = sorteio < malha.prob_falha[inicio:fim, None]
+            sorteio &= malha.ativa[inicio:fim, None]  # Bloqueada já está fora
+            falhas[:, inicio // 8 : (fim + 7) // 8] = np.packbits(sorteio.T, axis=1)
+
+        def _falhou(amostras, posicoes) -> np.ndarray:
+            """Matriz booleana amostras x posições CSR."""
+            posicoes = np.asarray(posicoes, dtype=np.intp)
+            bits = falhas[np.ix_(amostras, posicoes >> 3)] >> (7 - (posicoes & 7))
+            return (bits & 1).astype(bool)
+
+        def _trechos(caminho):
+            return [malha.posicao_aresta(u, v) for u, v in zip(caminho, caminho[1:])]
+
+        # Rota 0: melhor rota sem falhas sorteadas
+        custo_nominal, caminho_nominal = self.buscar_melhor_rota(origem, destinos)
+        rotas = [(custo_nominal, caminho_nominal)]
+        rota_amostra = np.zeros(n_amostras, dtype=np.intp)
+
+        chave = _trechos(caminho_nominal)
+        pendentes = (
+            np.flatnonzero(_falhou(np.arange(n_amostras), chave).any(axis=1))
+            if chave
+            else np.empty(0, dtype=np.intp)
+        )
+        alvos = [malha.indice[d] for d in destinos if d in malha.indice]
+        # Falhas só removem arestas: o limite da malha intacta vale em toda amostra
+        potencial = malha.limites_ate(alvos) if pendentes.size else None
+
+        def _resolver(mascara) -> int:
+            r = malha.dijkstra_modal(
+                malha.indice[origem],
+                alvos,
+                CUSTO_TRANSBORDO,
+                mascara.tobytes(),
+                primeiro=True,
+                potencial=potencial,
             )
-            dist = np.sqrt(
-                (x_click - (x1 + t * dx)) ** 2 + (y_click - (y1 + t * dy)) ** 2
+            custo, caminho = next(iter(r.values()), (float("inf"), []))
+            rotas.append((custo, [malha.nos[i] for i in caminho]))
+            return len(rotas) - 1
+
+        while pendentes.size:
+            # Grupos pelo padrão de falhas nas arestas-chave (bits empacotados)
+            padroes = np.packbits(_falhou(pendentes, chave), axis=1)
+            _, primeira, inversa = np.unique(
+                padroes, axis=0, return_index=True, return_inverse=True
             )
-            if dist < min_distance:
-                min_distance = dist
-                closest_edge = (u, v)
-        return closest_edge if min_distance < tolerance else None
+            inversa = inversa.reshape(-1)
+            ordem = np.argsort(inversa, kind="stable")
+            limites = np.cumsum(np.bincount(inversa))[:-1]
+            resolvida = np.zeros(pendentes.size, dtype=bool)
+            novas_chaves = []
+            for amostra, membros in zip(pendentes[primeira], np.split(ordem, limites)):
+                resolvida[membros] = True
+                if membros.size == 1:
+                    bits = np.unpackbits(falhas[amostra], count=n_arestas)
+                    rota_amostra[amostra] = _resolver(malha.ativa & ~bits.view(bool))
+                    continue
+                mascara = malha.ativa.copy()
+                mascara[chave] &= ~_falhou([amostra], chave)[0]
+                indice = _resolver(mascara)
+                trechos = _trechos(rotas[indice][1])
+                intacta = ~_falhou(pendentes[membros], trechos).any(axis=1)
+                rota_amostra[pendentes[membros[intacta]]] = indice
+                resolvida[membros[~intacta]] = False
+                if not intacta.all():
+                    novas_chaves.extend(trechos)
+            pendentes = pendentes[~resolvida]
+            chave = list(dict.fromkeys(chave + novas_chaves))
+
+        custos_rota = np.array([c for c, _ in rotas], dtype=float)
+        custos = custos_rota[rota_amostra]
+        viaveis = custos[np.isfinite(custos)]
+
+        # Frequência de uso de cada trecho e de cada porto
+        contagem = np.bincount(rota_amostra, minlength=len(rotas))
+        uso_arestas, uso_portos = {}, {}
+        for (_, caminho), n in zip(rotas, contagem.tolist()):
+            if not caminho or not n:
+                continue
+            for aresta in zip(caminho, caminho[1:]):
+                uso_arestas[aresta] = uso_arestas.get(aresta, 0) + n
+            uso_portos[caminho[-1]] = uso_portos.get(caminho[-1], 0) + n
+        uso_arestas = {
+            e: n / n_amostras
+            for e, n in sorted(uso_arestas.items(), key=lambda x: -x[1])
+        }
+        uso_portos = {p: n / n_amostras for p, n in uso_portos.items()}
+
+        return {
+            "amostras": n_amostras,
+            "custo_esperado": float(viaveis.mean()) if viaveis.size else float("inf"),
+            "custo_p95": (
+                float(np.percentile(viaveis, 95)) if viaveis.size else float("inf")
+            ),
+            "prob_sem_rota": (n_amostras - viaveis.size) / n_amostras,
+            "uso_arestas": uso_arestas,
+            "uso_portos": uso_portos,
+            "cenarios_resolvidos": len(rotas),
+        }
+
+    def _construir_indice_espacial(self, segmentos: np.ndarray, coords: np.ndarray):
+        """
+        Guarda os segmentos das arestas (posições CSR e coordenadas, já
+        compilados por carga.ler_rede) e uma grade uniforme em forma CSR
+        (célula -> índices dos segmentos cuja caixa a toca), para que o
+        clique só avalie os segmentos vizinhos.
+        """
+        seg = np.asarray(coords, dtype=float).reshape(-1, 4)
+        self._seg_posicoes = np.asarray(segmentos, dtype=np.int64)
+        self._seg_p1 = seg[:, :2]
+        self._seg_d = seg[:, 2:] - seg[:, :2]
+        self._seg_len2 = (self._seg_d**2).sum(axis=1)
+
+        self._grade_indptr = np.zeros(1, dtype=np.int64)
+        self._grade_segmentos = np.zeros(0, dtype=np.int64)
+        self._grade_origem = (0.0, 0.0)
+        self._grade_celula = 1.0
+        self._grade_dim = (0, 0)
+        if not len(seg):
+            return
+
+        xs, ys = seg[:, [0, 2]], seg[:, [1, 3]]
+        x0, y0 = xs.min(), ys.min()
+        extensao = max(xs.max() - x0, ys.max() - y0)
+        celula = extensao / math.ceil(math.sqrt(len(seg))) or 1.0
+        ix_min = np.floor((xs.min(axis=1) - x0) / celula).astype(int)
+        ix_max = np.floor((xs.max(axis=1) - x0) / celula).astype(int)
+        iy_min = np.floor((ys.min(axis=1) - y0) / celula).astype(int)
+        iy_max = np.floor((ys.max(axis=1) - y0) / celula).astype(int)
+
+        # Expande cada segmento nas células da sua caixa, sem laço em Python
+        largura = ix_max - ix_min + 1
+        altura = iy_max - iy_min + 1
+        por_segmento = largura * altura
+        seg_id = np.repeat(np.arange(len(seg)), por_segmento)
+        k = np.arange(seg_id.size) - np.repeat(
+            np.cumsum(por_segmento) - por_segmento, por_segmento
+        )
+        cx = ix_min[seg_id] + k // altura[seg_id]
+        cy = iy_min[seg_id] + k % altura[seg_id]
+        dim_x, dim_y = int(ix_max.max()) + 1, int(iy_max.max()) + 1
+        chave = cx * dim_y + cy
+        ordem = np.argsort(chave, kind="stable")  # Mantém a ordem das arestas
+        self._grade_indptr = np.concatenate(
+            ([0], np.cumsum(np.bincount(chave, minlength=dim_x * dim_y)))
+        )
+        self._grade_segmentos = seg_id[ordem]
+        self._grade_origem = (x0, y0)
+        self._grade_celula = celula
+        self._grade_dim = (dim_x, dim_y)
+
+    def _find_closest_edge(self, x_click, y_click, tolerance=0.8):
+        # Células da grade que cobrem o quadrado de lado 2*tolerance no clique
+        x0, y0 = self._grade_origem
+        celula = self._grade_celula
+        cx0 = max(math.floor((x_click - tolerance - x0) / celula), 0)
+        cx1 = min(
+            math.floor((x_click + tolerance - x0) / celula), self._grade_dim[0] - 1
+        )
+        cy0 = max(math.floor((y_click - tolerance - y0) / celula), 0)
+        cy1 = min(
+            math.floor((y_click + tolerance - y0) / celula), self._grade_dim[1] - 1
+        )
+        indptr, dim_y = self._grade_indptr, self._grade_dim[1]
+        blocos = [
+            self._grade_segmentos[indptr[c] : indptr[c + 1]]
+            for cx in range(cx0, cx1 + 1)
+            for c in range(cx * dim_y + cy0, cx * dim_y + cy1 + 1)
+        ]
+        if not blocos:
+            return None
+
+        # np.unique ordena os índices: o empate continua indo para a primeira aresta
+        idx = np.unique(np.concatenate(blocos))
+        malha = self._malha
+        # Arestas bloqueadas saem do estado atual
+        idx = idx[malha.ativa[self._seg_posicoes[idx]]]
+        if idx.size == 0:
+            return None
+
+        p1, d = self._seg_p1[idx], self._seg_d[idx]
+        t = np.clip(
+            ((x_click - p1[:, 0]) * d[:, 0] + (y_click - p1[:, 1]) * d[:, 1])
+            / self._seg_len2[idx],
+            0,
+            1,
+        )
+        dist = np.sqrt(
+            (x_click - (p1[:, 0] + t * d[:, 0])) ** 2
+            + (y_click - (p1[:, 1] + t * d[:, 1])) ** 2
+        )
+        k = int(np.argmin(dist))
+        if dist[k] >= tolerance:
+            return None
+        p = self._seg_posicoes[idx[k]]
+        return malha.nos[malha._origem[p]], malha.nos[malha._destino[p]]
 
     # --- RENDERIZAÇÃO ---
     def desenhar_mapa_interativo(
-        self, ax, arestas_bloqueadas, melhor_caminho, caminho_parcial=None
+        self,
+        ax,
+        arestas_bloqueadas,
+        melhor_caminho,
+        caminho_parcial=None,
+        animado=False,
     ):
-        ax.clear()
+        """
+        Renderização em modo retido: malha, rótulos, nós e legenda são montados
+        uma vez por eixo (e refeitos só quando clima ou dados mudam). A cada
+        quadro apenas bloqueios, rota destacada e veículo são atualizados.
+        Retorna os artistas dinâmicos (rota + veículo); com animado=True eles
+        ficam fora do desenho normal, prontos para blitting.
+        """
+        inicio = time.perf_counter()
+        camadas = self._camadas_render.get(ax)
+        chave = (
+            self.nivel_chuva,
+            self._versao_clima,
+            self._hash_dados,
+            tuple(self.origens),
+        )
+        if (
+            camadas is None
+            or camadas["chave"] != chave
+            or ax.get_legend() is not camadas["legenda"]  # Eixo limpo por fora
+        ):
+            with self.metricas.span("render.estatico"):
+                camadas = self._montar_camadas_estaticas(ax)
+            self._camadas_render[ax] = camadas
 
-        # Mudança visual sutil no fundo se estiver chovendo
-        ax.set_facecolor("#E5E7EB" if self.modo_chuva else COLORS["bg"])
+        with self.metricas.span("render.bloqueios"):
+            self._atualizar_camada_bloqueios(ax, camadas, arestas_bloqueadas)
 
         caminho_visual = (
             caminho_parcial if caminho_parcial is not None else melhor_caminho
         )
+        with self.metricas.span("render.rota"):
+            dinamicos = self._atualizar_camada_rota(ax, camadas, caminho_visual)
+        for artista in dinamicos:
+            artista.set_animated(animado)
+
+        # Título Dinâmico
+        titulo = "MAPA OPERACIONAL (CONDIÇÕES NORMAIS)"
+        cor_titulo = COLORS["text"]
+        if self.modo_chuva:
+            chuva = (
+                "CHUVAS INTENSAS"
+                if self.nivel_chuva == "intensa"
+                else f"CHUVA {self.nivel_chuva.upper()}"
+            )
+            titulo = f"⚠️ ALERTA: {chuva} E ESTRADAS DE TERRA"
+            cor_titulo = COLORS["alert"]
+
+        ax.set_title(
+            titulo, fontsize=12, fontweight="bold", color=cor_titulo, loc="left"
+        )
+        duracao = time.perf_counter() - inicio
+        self.tempos_quadros.append(duracao)
+        self.metricas.registrar("render.mapa", duracao)
+        return dinamicos
+
+    def _montar_camadas_estaticas(self, ax):
+        """Desenha a malha completa (inclusive arestas bloqueadas, ocultas depois)."""
+        # Import tardio: o núcleo de roteamento não carrega o matplotlib
+        import matplotlib.patches as mpatches
+        import matplotlib.lines as mlines
+
+        ax.clear()
+
+        # Mudança visual sutil no fundo se estiver chovendo
+        ax.set_facecolor("#E5E7EB" if self.modo_chuva else COLORS["bg"])
+
+        G = self._initial_graph
+        atributos = {
+            (u, v): self._atributos_aresta(u, v, self._overlay_clima)
+            for u, v in G.edges()
+        }
 
         # 1. Ferrovias
-        rail_edges = [
-            (u, v) for u, v, d in self.graph.edges(data=True) if d.get("type") == "rail"
-        ]
-        nx.draw_networkx_edges(
-            self.graph,
+        rail_edges = [e for e, d in atributos.items() if d.get("type") == "rail"]
+        rail_patches = nx.draw_networkx_edges(
+            G,
             self.pos,
             edgelist=rail_edges,
             edge_color=COLORS["rail"],
@@ -185,9 +1213,9 @@ class SoyLogisticsNet:
         # 2. Rodovias com Heatmap Dinâmico
         road_edges = []
         road_colors = []
-        for u, v, d in self.graph.edges(data=True):
+        for e, d in atributos.items():
             if d.get("type") == "road":
-                road_edges.append((u, v))
+                road_edges.append(e)
                 prob = d.get("failure_prob", 0.0)
                 # Escala de risco ajustada
                 if prob >= 0.20:
@@ -197,8 +1225,8 @@ class SoyLogisticsNet:
                 else:
                     road_colors.append(COLORS["road_safe"])
 
-        nx.draw_networkx_edges(
-            self.graph,
+        road_patches = nx.draw_networkx_edges(
+            G,
             self.pos,
             edgelist=road_edges,
             edge_color=road_colors,
@@ -210,11 +1238,10 @@ class SoyLogisticsNet:
 
         # Labels
         edge_labels = {
-            (u, v): f"{d['label']}\nR$ {d['weight']:.0f}"
-            for u, v, d in self.graph.edges(data=True)
+            e: f"{d['label']}\nR$ {d['weight']:.0f}" for e, d in atributos.items()
         }
-        nx.draw_networkx_edge_labels(
-            self.graph,
+        rotulos = nx.draw_networkx_edge_labels(
+            G,
             self.pos,
             edge_labels=edge_labels,
             font_size=6,
@@ -230,10 +1257,11 @@ class SoyLogisticsNet:
         )
 
         # Nós
+        origens = [n for n in self.origens if n in self.pos]
         nx.draw_networkx_nodes(
-            self.graph,
+            G,
             self.pos,
-            nodelist=["Sorriso_MT"],
+            nodelist=origens,
             node_shape="D",
             node_size=3500,
             node_color=COLORS["node_origin"],
@@ -243,11 +1271,11 @@ class SoyLogisticsNet:
         )
         portos = [
             n
-            for n in self.graph.nodes()
+            for n in G.nodes()
             if "Santos" in n or "Miritituba" in n or "Santarem" in n
         ]
         nx.draw_networkx_nodes(
-            self.graph,
+            G,
             self.pos,
             nodelist=portos,
             node_shape="s",
@@ -257,9 +1285,9 @@ class SoyLogisticsNet:
             edgecolors="white",
             linewidths=2,
         )
-        hubs = [n for n in self.graph.nodes() if n not in portos and n != "Sorriso_MT"]
+        hubs = [n for n in G.nodes() if n not in portos and n not in origens]
         nx.draw_networkx_nodes(
-            self.graph,
+            G,
             self.pos,
             nodelist=hubs,
             node_shape="o",
@@ -280,7 +1308,7 @@ class SoyLogisticsNet:
         }
         pos_labels = {k: (v[0], v[1] - 0.5) for k, v in self.pos.items()}
         nx.draw_networkx_labels(
-            self.graph,
+            G,
             pos_labels,
             labels=labels_clean,
             font_size=9,
@@ -289,21 +1317,98 @@ class SoyLogisticsNet:
             ax=ax,
         )
 
+        # Legenda
+        legend_elements = [
+            mpatches.Patch(color=COLORS["node_origin"], label="Origem"),
+            mpatches.Patch(color=COLORS["node_port"], label="Porto"),
+            mlines.Line2D([], [], color=COLORS["road_safe"], label="Rodovia (Segura)"),
+            mlines.Line2D([], [], color=COLORS["road_warn"], label="Risco Médio"),
+            mlines.Line2D([], [], color=COLORS["road_danger"], label="Alto Risco"),
+            mlines.Line2D(
+                [], [], color=COLORS["rail"], linestyle="--", label="Ferrovia"
+            ),
+            mlines.Line2D(
+                [],
+                [],
+                color=COLORS["alert"],
+                linewidth=3,
+                linestyle=":",
+                label="Bloqueio",
+            ),
+            mlines.Line2D(
+                [0],
+                [0],
+                marker="h",
+                color="w",
+                markerfacecolor=COLORS["highlight"],
+                markersize=10,
+                label="Veículo",
+            ),
+        ]
+        legenda = ax.legend(
+            handles=legend_elements,
+            loc="upper right",
+            fontsize=7,
+            facecolor="white",
+            framealpha=0.9,
+        )
+        legenda.set_zorder(20)
+
+        ax.set_xticks([])
+        ax.set_yticks([])
+        for spine in ax.spines.values():
+            spine.set_visible(False)
+
+        return {
+            "chave": (
+                self.nivel_chuva,
+                self._versao_clima,
+                self._hash_dados,
+                tuple(self.origens),
+            ),
+            "legenda": legenda,
+            "arestas": dict(zip(rail_edges + road_edges, rail_patches + road_patches)),
+            "rotulos": rotulos,
+            "bloqueios": frozenset(),
+            "artistas_bloqueio": [],
+            "rota": [],
+            "artistas_rota": [],
+            "veiculo": None,
+        }
+
+    def _atualizar_camada_bloqueios(self, ax, camadas, arestas_bloqueadas):
+        """Refaz só a sobreposição de bloqueios, e apenas se o conjunto mudou."""
+        bloqueios = frozenset(arestas_bloqueadas or ())
+        if bloqueios == camadas["bloqueios"]:
+            return
+
+        for artista in camadas["artistas_bloqueio"]:
+            artista.remove()
+        # Aresta bloqueada some da malha (como se tivesse sido removida do grafo)
+        for aresta in camadas["bloqueios"] ^ bloqueios:
+            visivel = aresta not in bloqueios
+            if aresta in camadas["arestas"]:
+                camadas["arestas"][aresta].set_visible(visivel)
+            if aresta in camadas["rotulos"]:
+                camadas["rotulos"][aresta].set_visible(visivel)
+
         # Bloqueios Manuais
-        if arestas_bloqueadas:
-            nx.draw_networkx_edges(
-                self.graph,
+        artistas = []
+        desenhaveis = [(u, v) for u, v in bloqueios if u in self.pos and v in self.pos]
+        if desenhaveis:
+            artistas += nx.draw_networkx_edges(
+                self._initial_graph,
                 self.pos,
-                edgelist=list(arestas_bloqueadas),
+                edgelist=desenhaveis,
                 edge_color=COLORS["alert"],
                 width=4,
                 style="dotted",
                 connectionstyle="arc3,rad=0.1",
                 ax=ax,
             )
-            for u, v in arestas_bloqueadas:
-                if u in self.pos and v in self.pos:
-                    mx, my = (np.array(self.pos[u]) + np.array(self.pos[v])) / 2
+            for u, v in desenhaveis:
+                mx, my = (np.array(self.pos[u]) + np.array(self.pos[v])) / 2
+                artistas.append(
                     ax.text(
                         mx,
                         my,
@@ -316,27 +1421,46 @@ class SoyLogisticsNet:
                         zorder=12,
                         bbox=dict(facecolor=COLORS["alert"], edgecolor="none", pad=2),
                     )
+                )
+        camadas["bloqueios"] = bloqueios
+        camadas["artistas_bloqueio"] = artistas
+
+    def _atualizar_camada_rota(self, ax, camadas, caminho_visual):
+        """
+        Atualiza rota ativa e veículo. Quando o caminho apenas cresce (quadro
+        seguinte da animação), só os trechos novos são desenhados.
+        """
+        caminho = list(caminho_visual or [])
+        anterior = camadas["rota"]
+        if caminho[: len(anterior)] != anterior:
+            for artista in camadas["artistas_rota"]:
+                artista.remove()
+            camadas["artistas_rota"] = []
+            anterior = []
 
         # Rota Ativa
-        if caminho_visual and len(caminho_visual) > 1:
-            path_edges = list(zip(caminho_visual[:-1], caminho_visual[1:]))
-            nx.draw_networkx_edges(
-                self.graph,
+        inicio = max(len(anterior) - 1, 0)
+        novos = list(zip(caminho[inicio:-1], caminho[inicio + 1 :]))
+        if novos:
+            camadas["artistas_rota"] += nx.draw_networkx_edges(
+                self._initial_graph,
                 self.pos,
-                edgelist=path_edges,
+                edgelist=novos,
                 edge_color=COLORS["highlight"],
                 width=5,
                 connectionstyle="arc3,rad=0.1",
                 ax=ax,
                 alpha=0.9,
             )
+        camadas["rota"] = caminho
 
         # Veículo (Z-Order corrigido)
-        if caminho_visual and len(caminho_visual) > 0:
-            current_node = caminho_visual[-1]
-            if current_node in self.pos:
-                vn = nx.draw_networkx_nodes(
-                    self.graph,
+        veiculo = camadas["veiculo"]
+        current_node = caminho[-1] if caminho else None
+        if current_node in self.pos:
+            if veiculo is None:
+                veiculo = nx.draw_networkx_nodes(
+                    self._initial_graph,
                     self.pos,
                     nodelist=[current_node],
                     node_shape="h",
@@ -346,62 +1470,22 @@ class SoyLogisticsNet:
                     edgecolors="white",
                     linewidths=2,
                 )
-                vn.set_zorder(15)
-
-        # Legenda
-        legend_elements = [
-            mpatches.Patch(color=COLORS["node_origin"], label="Origem"),
-            mpatches.Patch(color=COLORS["node_port"], label="Porto"),
-            mlines.Line2D([], [], color=COLORS["road_safe"], label="Rodovia (Segura)"),
-            mlines.Line2D([], [], color=COLORS["road_warn"], label="Risco Médio"),
-            mlines.Line2D([], [], color=COLORS["road_danger"], label="Alto Risco"),
-            mlines.Line2D(
-                [], [], color=COLORS["rail"], linestyle="--", label="Ferrovia"
-            ),
-            mlines.Line2D(
-                [],
-                [],
-                color=COLORS["alert"],
-                linewidth=3,
-                linestyle=":",
-                label="Bloqueio",
-            ),
-            mlines.Line2D(
-                [0],
-                [0],
-                marker="h",
-                color="w",
-                markerfacecolor=COLORS["highlight"],
-                markersize=10,
-                label="Veículo",
-            ),
-        ]
-        ax.legend(
-            handles=legend_elements,
-            loc="upper right",
-            fontsize=7,
-            facecolor="white",
-            framealpha=0.9,
-        ).set_zorder(20)
-
-        ax.set_xticks([])
-        ax.set_yticks([])
-        for spine in ax.spines.values():
-            spine.set_visible(False)
+                veiculo.set_zorder(15)
+                camadas["veiculo"] = veiculo
+            else:
+                veiculo.set_offsets([self.pos[current_node]])
+            veiculo.set_visible(True)
+        elif veiculo is not None:
+            veiculo.set_visible(False)
 
-        # Título Dinâmico
-        titulo = "MAPA OPERACIONAL (CONDIÇÕES NORMAIS)"
-        cor_titulo = COLORS["text"]
-        if self.modo_chuva:
-            titulo = "⚠️ ALERTA: CHUVAS INTENSAS E ESTRADAS DE TERRA"
-            cor_titulo = COLORS["alert"]
-
-        ax.set_title(
-            titulo, fontsize=12, fontweight="bold", color=cor_titulo, loc="left"
-        )
+        dinamicos = list(camadas["artistas_rota"])
+        if veiculo is not None:
+            dinamicos.append(veiculo)
+        return dinamicos
 
     # --- PAINEL ANALÍTICO (Simplificado: Apenas Barra de Custo) ---
     def desenhar_painel_analitico(self, ax, custo_atual, custo_base):
+        inicio = time.perf_counter()
         ax.clear()
         ax.set_facecolor(COLORS["bg"])
 
@@ -471,3 +1555,4 @@ class SoyLogisticsNet:
             color=COLORS["text"],
             loc="left",
         )
+        self.metricas.registrar("render.painel", time.perf_counter() - inicio)
@@ -0,0 +1,208 @@
+# Arquivo: dinamica.py
+
+import heapq
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Tuple
+
+from malha import MalhaCompacta
+
+INF = float("inf")
+
+
+class ArvoreRotas:
+    """
+    Árvore de caminhos mínimos a partir de uma origem fixa, sobre os mesmos
+    estados (nó, modal de chegada) do Dijkstra modal, reparada localmente
+    quando arestas mudam (bloqueio, desbloqueio ou novo peso).
+
+    Aresta da árvore que encarece ou some invalida só a subárvore abaixo
+    dela; os estados invalidados recebem o melhor candidato vindo de fora
+    da subárvore e as arestas alteradas são relaxadas de novo. A partir
+    dessas sementes um Dijkstra propaga apenas as melhorias, então o custo
+    do reparo é proporcional à região afetada e não à malha inteira.
+    """
+
+    def __init__(self, malha: MalhaCompacta, origem: int, custo_transbordo: float):
+        self.malha = malha
+        self.origem = origem
+        self.custo_transbordo = custo_transbordo
+        self.K = len(malha.modais) + 1
+        n_estados = len(malha.nos) * self.K
+        self.dist = [INF] * n_estados
+        self.pai = [-1] * n_estados  # Estado anterior na árvore
+        self.aresta_pai = [-1] * n_estados  # Posição da aresta na CSR
+        self.filhos: Dict[int, set] = {}
+        self.ultimo_reparo = 0  # Estados assentados no último reparo
+        self._diario = None  # Ligações desfeitas na saída de provisoria()
+
+        raiz = origem * self.K
+        self.dist[raiz] = 0
+        self._propagar([(0, raiz)])
+
+    def _custo(self, estado: int, p: int) -> float:
+        malha = self.malha
+        novo = self.dist[estado] + malha._peso[p]
+        modal_ant = estado % self.K
+        if modal_ant and modal_ant != malha._modal[p] + 1:
+            novo += self.custo_transbordo
+        return novo
+
+    def _ligar(self, estado: int, pai: int, p: int, custo: float):
+        antigo = self.pai[estado]
+        if self._diario is not None:
+            self._diario.append(
+                (estado, antigo, self.aresta_pai[estado], self.dist[estado])
+            )
+        if antigo != -1:
+            self.filhos[antigo].discard(estado)
+        self.dist[estado] = custo
+        self.pai[estado] = pai
+        self.aresta_pai[estado] = p
+        if pai != -1:
+            self.filhos.setdefault(pai, set()).add(estado)
+
+    def _propagar(self, fila: List[Tuple[float, int]]):
+        """Dijkstra a partir das sementes: só segue quem melhorou."""
+        malha, K = self.malha, self.K
+        indptr, destino, peso, modal, ativa = (
+            malha._indptr,
+            malha._destino,
+            malha._peso,
+            malha._modal,
+            malha._ativa,
+        )
+        dist, transbordo = self.dist, self.custo_transbordo
+        heapq.heapify(fila)
+        assentados = 0
+        while fila:
+            custo, estado = heapq.heappop(fila)
+            if custo > dist[estado]:
+                continue
+            assentados += 1
+            u, modal_ant = divmod(estado, K)
+            for p in range(indptr[u], indptr[u + 1]):
+                if not ativa[p]:
+                    continue
+                novo = custo + peso[p]  # Mesmo cálculo de _custo, sem a chamada
+                if modal_ant and modal_ant != modal[p] + 1:
+                    novo += transbordo
+                prox = destino[p] * K + modal[p] + 1
+                if novo < dist[prox]:
+                    self._ligar(prox, estado, p, novo)
+                    heapq.heappush(fila, (novo, prox))
+        self.ultimo_reparo = assentados
+        return assentados
+
+    def atualizar(self, posicoes: Iterable[int]):
+        """
+        Repara a árvore depois que as arestas `posicoes` mudaram na malha
+        (ativa e/ou peso já atualizados nos buffers).
+        """
+        malha, K = self.malha, self.K
+        posicoes = set(posicoes)
+
+        # 1. Arestas da árvore que encareceram ou sumiram derrubam a subárvore
+        invalidos = set()
+        for p in posicoes:
+            prox = malha._destino[p] * K + malha._modal[p] + 1
+            if self.aresta_pai[prox] != p:
+                continue
+            if malha._ativa[p] and self._custo(self.pai[prox], p) <= self.dist[prox]:
+                continue
+            pilha = [prox]
+            while pilha:
+                estado = pilha.pop()
+                if estado not in invalidos:
+                    invalidos.add(estado)
+                    pilha.extend(self.filhos.get(estado, ()))
+        for estado in invalidos:
+            self._ligar(estado, -1, -1, INF)
+
+        # 2. Estados invalidados: melhor entrada vinda de fora da subárvore
+        fila = []
+        if invalidos:
+            indptr_r, entradas = malha._csr_reversa()
+            origem, peso, modal, ativa = (
+                malha._origem,
+                malha._peso,
+                malha._modal,
+                malha._ativa,
+            )
+            dist, transbordo = self.dist, self.custo_transbordo
+            for estado in invalidos:
+                v, modal_chegada = divmod(estado, K)
+                melhor, pai, aresta = INF, -1, -1
+                for i in range(indptr_r[v], indptr_r[v + 1]):
+                    p = entradas[i]
+                    if not ativa[p] or modal[p] + 1 != modal_chegada:
+                        continue
+                    base = origem[p] * K
+                    for anterior in range(base, base + K):
+                        custo = dist[anterior] + peso[p]
+                        if anterior != base and anterior - base != modal_chegada:
+                            custo += transbordo
+                        if custo < melhor:
+                            melhor, pai, aresta = custo, anterior, p
+                if pai != -1:
+                    self._ligar(estado, pai, aresta, melhor)
+                    fila.append((melhor, estado))
+
+        # 3. Arestas alteradas (desbloqueio ou barateamento) podem melhorar rotas
+        for p in posicoes:
+            if malha._ativa[p]:
+                self._relaxar(malha._origem[p], p, fila)
+        return self._propagar(fila)
+
+    @contextmanager
+    def provisoria(self):
+        """
+        Reparos feitos dentro do bloco são desfeitos na saída, repondo as
+        ligações anotadas (sem nova busca). Quem mexeu na malha a restaura.
+        """
+        externo, self._diario = self._diario, []
+        try:
+            yield self
+        finally:
+            diario, self._diario = self._diario, None
+            for estado, pai, p, custo in reversed(diario):
+                self._ligar(estado, pai, p, custo)
+            self._diario = externo
+
+    def _relaxar(self, u: int, p: int, fila: list):
+        prox = self.malha._destino[p] * self.K + self.malha._modal[p] + 1
+        for estado in range(u * self.K, (u + 1) * self.K):
+            if self.dist[estado] == INF:
+                continue
+            novo = self._custo(estado, p)
+            if novo < self.dist[prox]:
+                self._ligar(prox, estado, p, novo)
+                fila.append((novo, prox))
+
+    def melhor_rota(self, destinos: Iterable[int]) -> Tuple[float, List[int]]:
+        """
+        (custo, posições CSR das arestas) da rota até o destino mais barato;
+        (inf, []) se nenhum é alcançável.
+        """
+        estados = [e for d in destinos for e in range(d * self.K, (d + 1) * self.K)]
+        melhor = min(estados, key=self.dist.__getitem__, default=-1)
+        if melhor == -1 or self.dist[melhor] == INF:
+            return INF, []
+        trechos = []
+        estado = melhor
+        while self.pai[estado] != -1:
+            trechos.append(self.aresta_pai[estado])
+            estado = self.pai[estado]
+        return self.dist[melhor], trechos[::-1]
+
+    def rota(self, destino: int) -> Tuple[float, List[int]]:
+        """(custo, caminho de ids) até o destino; (inf, []) se inalcançável."""
+        estados = range(destino * self.K, (destino + 1) * self.K)
+        melhor = min(estados, key=lambda e: self.dist[e])
+        if self.dist[melhor] == INF:
+            return INF, []
+        caminho = []
+        estado = melhor
+        while estado != -1:
+            caminho.append(estado // self.K)
+            estado = self.pai[estado]
+        return self.dist[melhor], caminho[::-1]
@@ -0,0 +1,171 @@
+# Arquivo: fluxo.py
+
+import heapq
+from typing import Dict, List
+
+import numpy as np
+
+from malha import MalhaCompacta
+
+EPS = 1e-9
+
+
+class _RedeResidual:
+    """Grafo residual em listas paralelas (arco i e seu reverso i ^ 1)."""
+
+    def __init__(self, n: int):
+        self.adj = [[] for _ in range(n)]
+        self.cabeca = []
+        self.cap = []
+        self.custo = []
+        self.trecho = []  # Posição da aresta física na malha (-1 = arco auxiliar)
+
+    def arco(self, u: int, v: int, cap: float, custo: float, trecho: int = -1):
+        self.adj[u].append(len(self.cabeca))
+        self.cabeca += [v, u]
+        self.cap += [cap, 0.0]
+        self.custo += [custo, -custo]
+        self.trecho += [trecho, -1]
+        self.adj[v].append(len(self.cabeca) - 1)
+
+
+def planejar_fluxo(
+    malha: MalhaCompacta,
+    origem: int,
+    portos: List[int],
+    volume: float,
+    custo_transbordo: float,
+    capacidade_portos: Dict[int, float] = None,
+) -> dict:
+    """
+    Fluxo de custo mínimo (caminhos mínimos sucessivos com potenciais) que
+    distribui `volume` toneladas da origem entre os portos respeitando a
+    capacidade das arestas (malha.capacidade) e dos portos.
+
+    Cada nó da malha vira 2K nós (chegada e saída por modal, K = nº de
+    modais); arcos chegada(m1) -> saída(m2) cobram o transbordo quando
+    m1 != m2, então o custo do fluxo é o mesmo de _calcular_custo_manual.
+    """
+    capacidade_portos = capacidade_portos or {}
+    K = len(malha.modais)
+    n = len(malha.nos)
+    base = n * 2 * K
+    fonte, sumidouro = base + len(portos), base + len(portos) + 1
+    rede = _RedeResidual(sumidouro + 1)
+
+    def saida(v, m):
+        return v * 2 * K + m
+
+    def chegada(v, m):
+        return v * 2 * K + K + m
+
+    ativas = np.flatnonzero(malha.ativa)
+    for p in ativas.tolist():
+        m = int(malha.modal[p])
+        rede.arco(
+            saida(int(malha.origem[p]), m),
+            chegada(int(malha.destino[p]), m),
+            float(malha.capacidade[p]),
+            float(malha.peso[p]),
+            p,
+        )
+    # Transbordo só onde há chegada e saída pela malha
+    nos_ativos = set(malha.origem[ativas].tolist()) & set(
+        malha.destino[ativas].tolist()
+    )
+    for v in nos_ativos:
+        for m1 in range(K):
+            for m2 in range(K):
+                custo = 0.0 if m1 == m2 else custo_transbordo
+                rede.arco(chegada(v, m1), saida(v, m2), float("inf"), custo)
+    for m in range(K):
+        rede.arco(fonte, saida(origem, m), volume, 0.0)
+    for j, porto in enumerate(portos):
+        for m in range(K):
+            rede.arco(chegada(porto, m), base + j, float("inf"), 0.0)
+        rede.arco(base + j, sumidouro, capacidade_portos.get(porto, float("inf")), 0.0)
+
+    # Caminhos mínimos sucessivos (custos >= 0, potenciais começam em zero)
+    potencial = [0.0] * len(rede.adj)
+    alocado, custo_total = 0.0, 0.0
+    while alocado < volume - EPS:
+        dist = {fonte: 0.0}
+        arco_pai = {}
+        fila = [(0.0, fonte)]
+        while fila:
+            d, u = heapq.heappop(fila)
+            if d > dist[u]:
+                continue
+            for a in rede.adj[u]:
+                if rede.cap[a] <= EPS:
+                    continue
+                v = rede.cabeca[a]
+                nd = d + rede.custo[a] + potencial[u] - potencial[v]
+                if nd < dist.get(v, float("inf")) - EPS:
+                    dist[v] = nd
+                    arco_pai[v] = a
+                    heapq.heappush(fila, (nd, v))
+        if sumidouro not in dist:
+            break
+        for v, d in dist.items():
+            potencial[v] += d
+
+        gargalo, v = volume - alocado, sumidouro
+        while v != fonte:
+            a = arco_pai[v]
+            gargalo = min(gargalo, rede.cap[a])
+            v = rede.cabeca[a ^ 1]
+        v = sumidouro
+        while v != fonte:
+            a = arco_pai[v]
+            rede.cap[a] -= gargalo
+            rede.cap[a ^ 1] += gargalo
+            custo_total += gargalo * rede.custo[a]
+            v = rede.cabeca[a ^ 1]
+        alocado += gargalo
+
+    return {
+        "volume": volume,
+        "alocado": alocado,
+        "nao_alocado": max(volume - alocado, 0.0),
+        "custo_total": custo_total,
+        "rotas": _decompor(rede, malha, fonte, sumidouro, custo_transbordo),
+    }
+
+
+def _decompor(rede, malha, fonte, sumidouro, custo_transbordo):
+    """Decompõe o fluxo final em rotas físicas com volume e custo por tonelada."""
+    fluxo = {
+        a: rede.cap[a ^ 1]
+        for a in range(0, len(rede.cabeca), 2)
+        if rede.cap[a ^ 1] > EPS
+    }
+    rotas = {}
+    while True:
+        arcos, u = [], fonte
+        while u != sumidouro:
+            a = next((a for a in rede.adj[u] if fluxo.get(a, 0) > EPS), None)
+            if a is None:
+                break
+            arcos.append(a)
+            u = rede.cabeca[a]
+        if u != sumidouro or not arcos:
+            break
+        volume = min(fluxo[a] for a in arcos)
+        for a in arcos:
+            fluxo[a] -= volume
+        trechos = [rede.trecho[a] for a in arcos if rede.trecho[a] >= 0]
+        caminho = [int(malha.origem[trechos[0]])] + [
+            int(malha.destino[p]) for p in trechos
+        ]
+        chave = tuple(caminho)
+        rotas[chave] = rotas.get(chave, 0.0) + volume
+
+    resultado = []
+    for caminho, volume in rotas.items():
+        custo, _ = malha.custo_caminho(list(caminho), custo_transbordo)
+        resultado.append(
+            {"caminho": list(caminho), "volume": volume, "custo_unitario": custo}
+        )
+    resultado.sort(key=lambda r: r["custo_unitario"])
+    return resultado
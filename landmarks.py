@@ -0,0 +1,172 @@
+# Arquivo: landmarks.py
+
+import heapq
+import io
+import os
+from collections import OrderedDict
+from typing import List
+
+import numpy as np
+
+from carga import gravar_atomico
+from malha import MalhaCompacta
+
+VERSAO_LANDMARKS = 1
+
+
+def caminho_landmarks(caminho: str) -> str:
+    return caminho + ".alt.npz"
+
+
+def _indexar(valores: np.ndarray, posicoes) -> List:
+    # Lista Python: indexação escalar rápida no laço do Dijkstra
+    return np.asarray(valores)[np.asarray(posicoes)].tolist()
+
+
+def _dijkstra_nos(indptr, vizinho, peso, origem: int, n: int) -> np.ndarray:
+    """Distâncias simples (sem modal) de um nó a todos, sobre listas de adjacência."""
+    dist = [float("inf")] * n
+    dist[origem] = 0.0
+    fila = [(0.0, origem)]
+    while fila:
+        d, u = heapq.heappop(fila)
+        if d > dist[u]:
+            continue
+        for i in range(indptr[u], indptr[u + 1]):
+            v = vizinho[i]
+            novo = d + peso[i]
+            if novo < dist[v]:
+                dist[v] = novo
+                heapq.heappush(fila, (novo, v))
+    return np.array(dist)
+
+
+class Landmarks:
+    """
+    Pré-processamento ALT (A*, landmarks e desigualdade triangular).
+
+    Para cada landmark L guarda d(L, v) e d(v, L) calculadas com os pesos
+    base e sem transbordo. Como o custo modal de qualquer trecho é >= ao
+    peso base, max_L(d(L,t) - d(L,v), d(v,L) - d(t,L)) é um limite inferior
+    consistente do custo modal de v até t: o A* continua exato com
+    transbordos, bloqueios (que só removem arestas) e chuva (que só
+    encarece). Se algum peso ficar abaixo do base, a busca volta a ser
+    Dijkstra puro (ver valido_para).
+    """
+
+    TAMANHO_CACHE = 64
+
+    def __init__(self, marcos, de, ate, peso_ref, sha: str = None, n_pedido=None):
+        self.n_pedido = len(marcos) if n_pedido is None else int(n_pedido)
+        self.marcos = np.asarray(marcos, dtype=np.int64)
+        self.de = np.asarray(de, dtype=np.float64)  # (k, n): d(L, v)
+        self.ate = np.asarray(ate, dtype=np.float64)  # (k, n): d(v, L)
+        self.peso_ref = np.asarray(peso_ref, dtype=np.float64)
+        self.sha = sha
+        self._potenciais = OrderedDict()  # frozenset(alvos) -> potencial por nó
+
+    @classmethod
+    def construir(
+        cls, malha: MalhaCompacta, n_marcos: int = 8, sha: str = None
+    ) -> "Landmarks":
+        """
+        Escolha por "mais distante": cada novo landmark é o nó que maximiza a
+        menor distância (ida + volta) aos já escolhidos.
+        """
+        n = len(malha.nos)
+        peso = malha.peso_base
+        direta = (malha._indptr, malha._destino, malha._peso_base)
+        indptr_r, posicoes = malha._csr_reversa()
+        reversa = (
+            indptr_r,
+            _indexar(malha.origem, posicoes),
+            _indexar(peso, posicoes),
+        )
+
+        marcos, de, ate = [], [], []
+        proximidade = np.full(n, np.inf)  # Menor distância a um landmark escolhido
+        candidato = int(np.argmax(np.diff(malha.indptr))) if n else 0
+        for _ in range(min(n_marcos, n)):
+            marcos.append(candidato)
+            de.append(_dijkstra_nos(*direta, candidato, n))
+            ate.append(_dijkstra_nos(*reversa, candidato, n))
+            # Ida + volta, contando só o sentido alcançável (malhas com mão única);
+            # nó sem ligação alguma com o landmark continua "distante" (inf)
+            ida, volta = np.isfinite(de[-1]), np.isfinite(ate[-1])
+            soma = np.where(ida, de[-1], 0) + np.where(volta, ate[-1], 0)
+            soma[~ida & ~volta] = np.inf
+            proximidade = np.minimum(proximidade, soma)
+            proximidade[marcos] = -1
+            candidato = int(np.argmax(proximidade))
+            if proximidade[candidato] <= 0:
+                break
+        return cls(
+            marcos,
+            np.array(de).reshape(len(marcos), n),
+            np.array(ate).reshape(len(marcos), n),
+            peso.copy(),
+            sha,
+            n_marcos,
+        )
+
+    def valido_para(self, malha: MalhaCompacta) -> bool:
+        """Os limites só valem se nenhum peso atual estiver abaixo do base."""
+        return len(self.peso_ref) == malha.n_arestas and bool(
+            np.all(malha.peso >= self.peso_ref)
+        )
+
+    def potencial(self, alvos: List[int]) -> List[float]:
+        """
+        Limite inferior do custo de cada nó até o alvo mais próximo (mínimo
+        entre alvos dos limites ALT). inf = nó que não alcança nenhum alvo.
+        Lista Python, pronta para o laço do A* (dijkstra_modal).
+        """
+        chave = frozenset(alvos)
+        if chave in self._potenciais:
+            self._potenciais.move_to_end(chave)
+            return self._potenciais[chave]
+
+        with np.errstate(invalid="ignore"):
+            limites = []
+            for t in alvos:
+                frente = self.de[:, [t]] - self.de  # d(L,t) - d(L,v)
+                volta = self.ate - self.ate[:, [t]]  # d(v,L) - d(t,L)
+                # inf - inf (nenhum dos dois alcança L) não informa nada
+                limite = np.fmax(frente, volta)
+                limite = np.nan_to_num(limite, nan=0.0, posinf=np.inf, neginf=0.0)
+                limites.append(np.maximum(limite.max(axis=0), 0.0))
+        potencial = np.min(limites, axis=0)
+        potencial[list(alvos)] = 0.0
+        potencial = potencial.tolist()
+        self._potenciais[chave] = potencial
+        if len(self._potenciais) > self.TAMANHO_CACHE:
+            self._potenciais.popitem(last=False)
+        return potencial
+
+    def salvar(self, caminho: str):
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            versao=np.array(VERSAO_LANDMARKS),
+            sha=np.array(self.sha or ""),
+            n_pedido=np.array(self.n_pedido),
+            marcos=self.marcos,
+            de=self.de,
+            ate=self.ate,
+            peso_ref=self.peso_ref,
+        )
+        gravar_atomico(caminho, buffer.getvalue())
+
+    @classmethod
+    def carregar(cls, caminho: str, sha: str, n_marcos: int = None):
+        """Lê o pré-processamento; None se for de outra versão ou outros dados."""
+        if not os.path.exists(caminho):
+            return None
+        with np.load(caminho, allow_pickle=False) as z:
+            if int(z["versao"]) != VERSAO_LANDMARKS or str(z["sha"]) != sha:
+                return None
+            if n_marcos is not None and int(z["n_pedido"]) != n_marcos:
+                return None
+            return cls(
+                z["marcos"], z["de"], z["ate"], z["peso_ref"], sha, z["n_pedido"]
+            )
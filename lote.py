@@ -0,0 +1,172 @@
+# Arquivo: lote.py
+
+import argparse
+import itertools
+import json
+import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List
+
+from core import DESTINOS, ORIGEM, SoyLogisticsNet
+
+logger = logging.getLogger("LogisticsBatch")
+
+# Estado de cada processo do pool: o grafo é carregado uma única vez por worker
+_rede_worker = None
+_destinos_worker = None
+
+
+def gerar_cenarios(
+    rede: SoyLogisticsNet,
+    origens: List[str],
+    max_bloqueios: int = 2,
+    climas=(False, True),
+) -> Iterator[Dict]:
+    """
+    Varredura completa: clima x bloqueios (nenhum, simples, duplos...) x origem.
+    """
+    arestas = rede.arestas()
+    n = 0
+    for origem in origens:
+        for chuva in climas:
+            for k in range(max_bloqueios + 1):
+                for bloqueios in itertools.combinations(arestas, k):
+                    yield {
+                        "id": n,
+                        "origem": origem,
+                        "chuva": chuva,
+                        "bloqueios": [list(e) for e in bloqueios],
+                    }
+                    n += 1
+
+
+def nivel_chuva(cenario: Dict, rede: SoyLogisticsNet = None) -> str:
+    """
+    Nível de chuva do cenário: "nivel_chuva" explícito ou o booleano "chuva"
+    (nível mais intenso da tabela da rede; "intensa" sem rede).
+    """
+    if cenario.get("nivel_chuva"):
+        return cenario["nivel_chuva"]
+    if not cenario.get("chuva"):
+        return "seco"
+    return rede.nivel_chuva_maximo() if rede is not None else "intensa"
+
+
+def _carregar_worker(json_path: str, destinos: List[str], landmarks: int = 0):
+    global _rede_worker, _destinos_worker
+    _rede_worker = SoyLogisticsNet()
+    _rede_worker.carregar_dados(json_path)
+    if landmarks:
+        _rede_worker.preparar_landmarks(landmarks)
+    _destinos_worker = destinos
+
+
+def iniciar_worker(json_path: str, destinos: List[str], landmarks: int = 0):
+    """
+    Inicializador de pool (lote e servico.py): carrega a malha uma vez no
+    processo filho e silencia o log do núcleo só ali.
+    """
+    logging.getLogger("LogisticsCore").setLevel(logging.ERROR)
+    _carregar_worker(json_path, destinos, landmarks)
+
+
+def avaliar_cenario(rede: SoyLogisticsNet, cenario: Dict, destinos: List[str]) -> Dict:
+    """Aplica clima/bloqueios do cenário na rede e devolve o resultado serializável."""
+    destinos = cenario.get("destinos", destinos)
+    rede.aplicar_nivel_chuva(nivel_chuva(cenario, rede))
+    rede.definir_bloqueios({tuple(e) for e in cenario.get("bloqueios", [])})
+    custo, caminho, tabela = rede.buscar_rotas_por_porto(
+        cenario.get("origem", ORIGEM), destinos
+    )
+
+    def _json(valor):
+        # JSON não tem infinito: rota impossível vira null
+        return valor if valor != float("inf") else None
+
+    return {
+        **cenario,
+        "custo": _json(custo),
+        "caminho": caminho,
+        "porto": caminho[-1] if caminho else None,
+        "por_porto": {p: _json(c) for p, (c, _) in tabela.items()},
+    }
+
+
+def _avaliar_cenario(cenario: Dict) -> Dict:
+    return avaliar_cenario(_rede_worker, cenario, _destinos_worker)
+
+
+def avaliar_lote(cenarios: List[Dict]) -> List[Dict]:
+    """
+    Tarefa de worker iniciado por iniciar_worker: avalia vários cenários em
+    um envio só, pagando a serialização entre processos uma vez.
+    """
+    return [_avaliar_cenario(c) for c in cenarios]
+
+
+def executar_cenarios(
+    json_path: str,
+    cenarios: Iterable[Dict],
+    destinos: List[str] = DESTINOS,
+    processos: int = None,
+) -> Iterator[Dict]:
+    """
+    Avalia os cenários em um pool de processos e devolve os resultados em
+    fluxo, na ordem de entrada. Com processos=1 roda no próprio processo.
+    """
+    cenarios = list(cenarios)
+    processos = processos or os.cpu_count() or 1
+    if processos == 1:
+        _carregar_worker(json_path, destinos)
+        yield from map(_avaliar_cenario, cenarios)
+        return
+
+    # Lotes grandes amortizam a serialização entre processos
+    chunksize = max(1, len(cenarios) // (processos * 4))
+    with ProcessPoolExecutor(
+        max_workers=processos,
+        initializer=iniciar_worker,
+        initargs=(json_path, destinos),
+    ) as pool:
+        yield from pool.map(_avaliar_cenario, cenarios, chunksize=chunksize)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Varredura de cenários logísticos em lote (saída JSONL)."
+    )
+    parser.add_argument("--dados", default="dados.json")
+    parser.add_argument(
+        "--cenarios",
+        help="Arquivo JSONL de cenários; sem ele, gera a varredura completa.",
+    )
+    parser.add_argument("--origens", nargs="+", default=[ORIGEM])
+    parser.add_argument("--destinos", nargs="+", default=DESTINOS)
+    parser.add_argument("--max-bloqueios", type=int, default=2)
+    parser.add_argument("--processos", type=int, default=None)
+    parser.add_argument("--saida", help="Arquivo JSONL de saída (padrão: stdout).")
+    args = parser.parse_args(argv)
+
+    if args.cenarios:
+        with open(args.cenarios, "r", encoding="utf-8") as f:
+            cenarios = [json.loads(linha) for linha in f if linha.strip()]
+    else:
+        rede = SoyLogisticsNet()
+        rede.carregar_dados(args.dados)
+        cenarios = list(gerar_cenarios(rede, args.origens, args.max_bloqueios))
+
+    saida = open(args.saida, "w", encoding="utf-8") if args.saida else sys.stdout
+    try:
+        for resultado in executar_cenarios(
+            args.dados, cenarios, args.destinos, args.processos
+        ):
+            saida.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+    finally:
+        if saida is not sys.stdout:
+            saida.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,18 @@
 # Arquivo: main.py
 
 import argparse
+import csv
+import json
 import logging
+import os
 import sys
-from datetime import datetime
-import matplotlib.pyplot as plt
-from matplotlib.gridspec import GridSpec
-from matplotlib.widgets import Button
+import time
 import copy
-from core import SoyLogisticsNet, COLORS
+from clima import carregar_regras_clima
+from core import COLORS, DESTINOS, ORIGEM, SoyLogisticsNet
 
-DESTINOS = ["Miritituba_PA", "Santos_SP"]
-ORIGEM = "Sorriso_MT"
+# O matplotlib só é importado no modo gráfico (ver iniciar_interface)
+plt = None
 
 rede = None
 fig = None
@@ -44,20 +45,52 @@ def animar_caminho(caminho, custo):
     caminho_parcial = []
     velocidade_animacao = 0.3
 
-    for i, node in enumerate(caminho):
+    # Blitting: o fundo (malha estática + bloqueios) é capturado uma vez e só a
+    # rota/veículo são redesenhados a cada quadro.
+    usar_blit = fig.canvas.supports_blit
+    if usar_blit:
+        fig.canvas.draw()
+        fundo = fig.canvas.copy_from_bbox(ax_map.bbox)
+
+    tempos = []
+    dinamicos = []
+    for node in caminho:
+        inicio = time.perf_counter()
         caminho_parcial.append(node)
-        rede.desenhar_mapa_interativo(
-            ax_map, arestas_bloqueadas, caminho, caminho_parcial=caminho_parcial
+        dinamicos = rede.desenhar_mapa_interativo(
+            ax_map,
+            arestas_bloqueadas,
+            caminho,
+            caminho_parcial=caminho_parcial,
+            animado=usar_blit,
         )
 
-        if i == len(caminho) - 1:
-            rede.desenhar_painel_analitico(ax_stats, custo, custo_base)
-            fig.canvas.manager.set_window_title(
-                f"Soy Logistics AI (Entrega: R${custo:.2f})"
-            )
+        if usar_blit:
+            fig.canvas.restore_region(fundo)
+            for artista in dinamicos:
+                ax_map.draw_artist(artista)
+            fig.canvas.blit(ax_map.bbox)
+            fig.canvas.flush_events()
+            tempos.append(time.perf_counter() - inicio)
+            fig.canvas.start_event_loop(velocidade_animacao)
+        else:
+            fig.canvas.draw_idle()
+            tempos.append(time.perf_counter() - inicio)
+            plt.pause(velocidade_animacao)
+
+    # Quadro final volta ao desenho normal (sobrevive a redimensionamentos)
+    for artista in dinamicos:
+        artista.set_animated(False)
+    rede.desenhar_painel_analitico(ax_stats, custo, custo_base)
+    fig.canvas.manager.set_window_title(f"Soy Logistics AI (Entrega: R${custo:.2f})")
+    fig.canvas.draw_idle()
 
-        fig.canvas.draw_idle()
-        plt.pause(velocidade_animacao)
+    if tempos:
+        logging.info(
+            f"Animação: {len(tempos)} quadros | "
+            f"média {sum(tempos) / len(tempos) * 1000:.1f} ms | "
+            f"máx {max(tempos) * 1000:.1f} ms"
+        )
 
 
 def atualizar_dashboard():
@@ -66,13 +99,11 @@ def atualizar_dashboard():
     """
     global rede, fig, ax_map, ax_stats, arestas_bloqueadas, custo_base, modo_chuva_ativo
 
-    # 1. Aplica Clima (Reseta o grafo)
+    # 1. Aplica Clima (camada incremental sobre o grafo base)
     rede.aplicar_condicoes_climaticas(modo_chuva_ativo)
 
-    # 2. Re-aplica bloqueios manuais
-    for u, v in arestas_bloqueadas:
-        if rede.graph.has_edge(u, v):
-            rede.graph.remove_edge(u, v)
+    # 2. Sincroniza bloqueios manuais (apenas as arestas alteradas)
+    rede.definir_bloqueios(arestas_bloqueadas)
 
     # 3. Busca Rota
     custo, caminho = rede.buscar_melhor_rota(ORIGEM, DESTINOS)
@@ -124,8 +155,11 @@ def reset_all(event):
 
 
 def export_report(event):
-    filename = f"report_{datetime.now().strftime('%H%M%S')}.pdf"
-    plt.savefig(filename)
+    from relatorio import nome_unico
+
+    # Data completa + sufixo: dois cliques no mesmo segundo não se sobrescrevem
+    filename = nome_unico("report", "pdf")
+    fig.savefig(filename, facecolor=fig.get_facecolor())
     print(f"Salvo: {filename}")
 
 
@@ -133,18 +167,89 @@ def export_report(event):
 btn_clima = None
 
 
-def main():
-    global rede, fig, ax_map, ax_stats, custo_base, btn_clima
-    setup_logging(False)
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Soy Logistics AI")
+    parser.add_argument(
+        "--headless",
+        action="store_true",
+        help="Calcula a rota sem interface gráfica e imprime JSON.",
+    )
+    parser.add_argument(
+        "--scenario",
+        help="Cenário em JSON (arquivo ou texto): origem, destinos, chuva/nivel_chuva, bloqueios.",
+    )
+    parser.add_argument("--dados", default="dados.json")
+    parser.add_argument(
+        "--criticidade",
+        metavar="ARQUIVO_CSV",
+        help="Grava o ranking de criticidade das arestas (modo headless).",
+    )
+    parser.add_argument(
+        "--fronteira-risco",
+        action="store_true",
+        help="Imprime as rotas não dominadas de custo x confiabilidade (modo headless).",
+    )
+    parser.add_argument(
+        "--regras-clima",
+        metavar="ARQUIVO_JSON",
+        help="Tabela de regras de clima e níveis de chuva (ver clima.py).",
+    )
+    parser.add_argument(
+        "--perfil",
+        metavar="ARQUIVO_PSTATS",
+        help="Executa sob o cProfile e grava as estatísticas (pstats) no arquivo.",
+    )
+    parser.add_argument(
+        "--metricas",
+        action="store_true",
+        help="Ao sair, imprime no stderr o snapshot de spans e contadores (JSON).",
+    )
+    return parser.parse_args(argv)
 
-    try:
-        rede = SoyLogisticsNet()
-        rede.carregar_dados("dados.json")
-    except Exception as e:
-        print(f"Erro: {e}")
-        return
 
-    custo_base, _ = rede.buscar_melhor_rota(ORIGEM, DESTINOS)
+def executar_headless(rede, scenario):
+    """Modo de linha de comando: nenhum módulo do matplotlib é carregado."""
+    from lote import avaliar_cenario
+
+    cenario = {}
+    if scenario:
+        if os.path.exists(scenario):
+            with open(scenario, "r", encoding="utf-8") as f:
+                cenario = json.load(f)
+        else:
+            cenario = json.loads(scenario)
+    resultado = avaliar_cenario(rede, cenario, DESTINOS)
+    print(json.dumps(resultado, ensure_ascii=False, indent=2))
+
+
+def exportar_criticidade(rede, arquivo):
+    """Ranking de arestas (e pares) mais críticas para ORIGEM -> DESTINOS."""
+    ranking = rede.ranking_criticidade(ORIGEM, DESTINOS)
+    with open(arquivo, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(
+            ["tipo", "arestas", "rotulos", "custo", "aumento", "aumento_pct"]
+        )
+        for tipo in ("arestas", "pares"):
+            for linha in ranking[tipo]:
+                writer.writerow(
+                    [
+                        "simples" if tipo == "arestas" else "par",
+                        " | ".join(f"{u}->{v}" for u, v in linha["arestas"]),
+                        " | ".join(linha["rotulos"]),
+                        f"{linha['custo']:.2f}",
+                        f"{linha['aumento']:.2f}",
+                        f"{linha['aumento_pct']:.1f}",
+                    ]
+                )
+    print(f"Salvo: {arquivo}")
+
+
+def iniciar_interface():
+    global plt, fig, ax_map, ax_stats, btn_clima
+    import matplotlib.pyplot as plt
+    from matplotlib.gridspec import GridSpec
+    from matplotlib.widgets import Button
 
     plt.ion()
     fig = plt.figure(figsize=(16, 9), facecolor=COLORS["bg"])
@@ -187,5 +292,61 @@ def main():
     plt.show(block=True)
 
 
+def main(argv=None):
+    args = parse_args(argv)
+    setup_logging(False)
+
+    if not args.perfil:
+        executar(args)
+        return
+
+    import cProfile
+    import pstats
+
+    perfil = cProfile.Profile()
+    try:
+        perfil.runcall(executar, args)
+    finally:
+        perfil.dump_stats(args.perfil)
+        estatisticas = pstats.Stats(perfil, stream=sys.stderr)
+        estatisticas.sort_stats("cumulative").print_stats(20)
+        logging.info(f"Perfil gravado em {args.perfil}")
+
+
+def executar(args):
+    global rede, custo_base
+    try:
+        rede = SoyLogisticsNet()
+        rede.origens = [ORIGEM]
+        rede.carregar_dados(args.dados)
+        if args.regras_clima:
+            rede.definir_regras_clima(*carregar_regras_clima(args.regras_clima))
+    except Exception as e:
+        print(f"Erro: {e}")
+        return
+
+    try:
+        if args.headless:
+            if args.criticidade:
+                exportar_criticidade(rede, args.criticidade)
+            elif args.fronteira_risco:
+                fronteira = rede.fronteira_risco(ORIGEM, DESTINOS)
+                print(json.dumps(fronteira, ensure_ascii=False, indent=2))
+            else:
+                executar_headless(rede, args.scenario)
+            return
+
+        # Cliques no mapa só reparam a árvore de rotas da origem do painel
+        rede.acompanhar_origem(ORIGEM)
+        custo_base, _ = rede.buscar_melhor_rota(ORIGEM, DESTINOS)
+        iniciar_interface()
+    finally:
+        if args.metricas:
+            print(
+                json.dumps(rede.snapshot_metricas(), ensure_ascii=False, indent=2),
+                file=sys.stderr,
+            )
+
+
 if __name__ == "__main__":
     main()
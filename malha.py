@@ -0,0 +1,497 @@
+# Arquivo: malha.py
+
+import heapq
+from array import array
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+# Buffers que definem a malha compilada (nome -> typecode do array.array)
+BUFFERS = {
+    "indptr": "q",
+    "origem": "i",
+    "destino": "i",
+    "peso": "d",
+    "distancia": "d",
+    "prob_falha": "d",
+    "capacidade": "d",
+    "modal": "b",
+}
+TIPOS_NUMPY = {"q": np.int64, "i": np.int32, "d": np.float64, "b": np.int8}
+
+
+class MalhaCompacta:
+    """
+    Representação CSR (adjacência em arrays) da malha logística.
+
+    Nós viram ids inteiros e os atributos das arestas ficam em buffers
+    tipados (float64 para peso/distância/falha/capacidade, int8 para o
+    modal). Cada
+    buffer é um array.array, indexado rapidamente nos laços em Python, e
+    também exposto como visão NumPy (sem cópia) para operações vetorizadas.
+    """
+
+    def __init__(self, nos: List[str], arestas: List[Tuple[str, str, dict]]):
+        self.nos = list(nos)
+        self.indice = {no: i for i, no in enumerate(self.nos)}
+        self.modais = tuple(dict.fromkeys(d.get("type", "road") for _, _, d in arestas))
+        codigo_modal = {m: i for i, m in enumerate(self.modais)}
+
+        # Ordena as arestas pelo nó de origem (estável: mantém a ordem de carga)
+        ordem = sorted(range(len(arestas)), key=lambda k: self.indice[arestas[k][0]])
+        n = len(self.nos)
+        contagem = [0] * (n + 1)
+        for u, _, _ in arestas:
+            contagem[self.indice[u] + 1] += 1
+        for i in range(n):
+            contagem[i + 1] += contagem[i]
+
+        self._indptr = array("q", contagem)
+        self._origem = array("i", (self.indice[arestas[k][0]] for k in ordem))
+        self._destino = array("i", (self.indice[arestas[k][1]] for k in ordem))
+        self._peso = array("d", (arestas[k][2]["weight"] for k in ordem))
+        self._distancia = array(
+            "d", (arestas[k][2].get("distance", 0.0) for k in ordem)
+        )
+        self._prob_falha = array(
+            "d", (arestas[k][2].get("failure_prob", 0.0) for k in ordem)
+        )
+        # Sem capacidade (ausente/None) = ilimitada; 0 é corredor fechado
+        capacidades = (arestas[k][2].get("capacity") for k in ordem)
+        self._capacidade = array(
+            "d", (c if c is not None else float("inf") for c in capacidades)
+        )
+        self._modal = array(
+            "b", (codigo_modal[arestas[k][2].get("type", "road")] for k in ordem)
+        )
+        self._iniciar()
+
+    @classmethod
+    def de_grafo(cls, G) -> "MalhaCompacta":
+        return cls(list(G.nodes()), list(G.edges(data=True)))
+
+    @classmethod
+    def de_arrays(
+        cls,
+        nos: List[str],
+        modais: Sequence[str],
+        buffers: Dict[str, np.ndarray],
+    ) -> "MalhaCompacta":
+        """
+        Remonta a malha a partir dos buffers já compilados (BUFFERS, na ordem
+        CSR), como os do cache .npz, sem reordenar nem percorrer arestas.
+        """
+        malha = cls.__new__(cls)
+        malha.nos = list(nos)
+        malha.indice = {no: i for i, no in enumerate(malha.nos)}
+        malha.modais = tuple(modais)
+        for nome, tipo in BUFFERS.items():
+            dados = np.ascontiguousarray(buffers[nome], dtype=TIPOS_NUMPY[tipo])
+            setattr(malha, "_" + nome, array(tipo, dados.tobytes()))
+        malha._iniciar()
+        return malha
+
+    def _iniciar(self):
+        self._ativa = array("b", [1]) * len(self._destino)
+        self._peso_base = array("d", self._peso)  # Pesos do grafo base (sem camadas)
+
+        # Visões NumPy que compartilham a memória dos buffers acima
+        self.indptr = np.frombuffer(self._indptr, dtype=np.int64)
+        self.origem = np.frombuffer(self._origem, dtype=np.int32)
+        self.destino = np.frombuffer(self._destino, dtype=np.int32)
+        self.peso = np.frombuffer(self._peso, dtype=np.float64)
+        self.distancia = np.frombuffer(self._distancia, dtype=np.float64)
+        self.prob_falha = np.frombuffer(self._prob_falha, dtype=np.float64)
+        self.capacidade = np.frombuffer(self._capacidade, dtype=np.float64)
+        self.modal = np.frombuffer(self._modal, dtype=np.int8)
+        self.ativa = np.frombuffer(self._ativa, dtype=np.bool_)
+        self.peso_base = np.frombuffer(self._peso_base, dtype=np.float64)
+
+        self._reversa = None  # CSR por destino, montada sob demanda
+        self._chaves = None  # Chaves u * n + v ordenadas, para busca vetorizada
+        self._posicao = None  # (u, v) -> posição, montado sob demanda
+        # Trabalho acumulado das buscas (lido pela instrumentação do núcleo)
+        self.contadores = {"buscas": 0, "estados_explorados": 0, "arestas_relaxadas": 0}
+
+    @property
+    def posicao(self) -> Dict[Tuple[int, int], int]:
+        """Posição CSR de cada aresta (id u, id v)."""
+        if self._posicao is None:
+            pares = zip(self._origem, self._destino)
+            self._posicao = dict(zip(pares, range(self.n_arestas)))
+        return self._posicao
+
+    @property
+    def n_arestas(self) -> int:
+        return len(self._destino)
+
+    def posicao_aresta(self, u: str, v: str) -> int:
+        return self.posicao[(self.indice[u], self.indice[v])]
+
+    def atualizar_aresta(self, u: str, v: str, dados: dict):
+        """Copia peso e probabilidade de falha efetivos para os buffers."""
+        p = self.posicao_aresta(u, v)
+        self._peso[p] = dados["weight"]
+        self._prob_falha[p] = dados.get("failure_prob", 0.0)
+
+    def definir_ativa(self, u: str, v: str, ativa: bool):
+        self._ativa[self.posicao_aresta(u, v)] = ativa
+
+    def dijkstra_modal(
+        self,
+        origem: int,
+        destinos: List[int],
+        custo_transbordo: float,
+        ativa=None,
+        modal_inicial: int = -1,
+        custo_inicial: float = 0,
+        primeiro: bool = False,
+        peso=None,
+        potencial=None,
+    ) -> Dict[int, Tuple[float, List[int]]]:
+        """
+        Dijkstra sobre estados (nó, modal de chegada) codificados como
+        nó * K + (modal + 1), com K = nº de modais + 1 (0 = sem modal, na
+        origem). A troca de modal cobra custo_transbordo. Para assim que todos
+        os destinos são assentados (ou o primeiro deles, com primeiro=True).
+        `ativa` permite uma máscara de arestas alternativa (qualquer sequência
+        indexável por posição, ex.: bytes). modal_inicial/custo_inicial
+        continuam uma rota já percorrida até a origem (desvios do Yen).
+        `peso` substitui os pesos atuais (ex.: um período do perfil sazonal).
+        `potencial` (limite inferior consistente do custo de cada nó até os
+        destinos, ex.: landmarks.Landmarks) transforma a busca em A*.
+        """
+        indptr, destino, modal = self._indptr, self._destino, self._modal
+        peso = self._peso if peso is None else peso
+        ativa = self._ativa if ativa is None else ativa
+        K = len(self.modais) + 1
+
+        h = potencial
+        inf = float("inf")
+        heappop, heappush = heapq.heappop, heapq.heappush
+        pendentes = set(destinos)
+        resultado = {}
+        inicio = origem * K + modal_inicial + 1
+        dist = {inicio: custo_inicial}
+        anterior = {inicio: -1}
+        fila = [(custo_inicial if h is None else custo_inicial + h[origem], 0, inicio)]
+        contador = 1  # Desempate estável no heap (conta também as relaxações)
+        explorados = 0
+        while fila and pendentes:
+            chave, _, estado = heappop(fila)
+            u = estado // K
+            modal_ant = estado - u * K
+            custo = dist[estado]
+            # Entrada obsoleta: o estado já foi alcançado por um custo menor
+            if chave > (custo if h is None else custo + h[u]):
+                continue
+            explorados += 1
+            if u in pendentes:
+                # Primeiro estado retirado do nó é o de menor custo entre os modais
+                pendentes.discard(u)
+                caminho = []
+                passo = estado
+                while passo != -1:
+                    caminho.append(passo // K)
+                    passo = anterior[passo]
+                resultado[u] = (custo, caminho[::-1])
+                if primeiro or not pendentes:
+                    break
+            for p in range(indptr[u], indptr[u + 1]):
+                if not ativa[p]:
+                    continue
+                modal_atual = modal[p] + 1
+                novo = custo + peso[p]
+                if modal_ant and modal_ant != modal_atual:
+                    novo += custo_transbordo
+                v = destino[p]
+                prox = v * K + modal_atual
+                if novo < dist.get(prox, inf):
+                    if h is None:
+                        chave = novo
+                    else:
+                        chave = novo + h[v]
+                        if chave == inf:
+                            continue  # v não alcança nenhum destino
+                    dist[prox] = novo
+                    anterior[prox] = estado
+                    heappush(fila, (chave, contador, prox))
+                    contador += 1
+        self._contabilizar(explorados, contador - 1)
+        return resultado
+
+    def _contabilizar(self, explorados: int, relaxadas: int):
+        self.contadores["buscas"] += 1
+        self.contadores["estados_explorados"] += explorados
+        self.contadores["arestas_relaxadas"] += relaxadas
+
+    def _csr_reversa(self):
+        """Arestas agrupadas por nó de destino: (indptr, posições na CSR direta)."""
+        if self._reversa is None:
+            ordem = np.argsort(self.destino, kind="stable")
+            indptr = np.zeros(len(self.nos) + 1, dtype=np.int64)
+            np.cumsum(
+                np.bincount(self.destino, minlength=len(self.nos)), out=indptr[1:]
+            )
+            self._reversa = (array("q", indptr.tolist()), array("q", ordem.tolist()))
+        return self._reversa
+
+    def custos_ate(
+        self,
+        destino: int,
+        origens: List[int],
+        custo_transbordo: float,
+        ativa=None,
+    ) -> Dict[int, float]:
+        """
+        Dijkstra reverso a partir de um porto: custo modal mínimo de cada
+        origem até ele. O estado é (nó, modal da aresta de saída), com 0 = fim
+        da rota; a aresta u->v de modal m paga transbordo se a rota seguir de v
+        por outro modal. Para quando todas as origens são assentadas.
+        """
+        indptr, posicoes = self._csr_reversa()
+        origem, peso, modal = self._origem, self._peso, self._modal
+        ativa = self._ativa if ativa is None else ativa
+        K = len(self.modais) + 1
+
+        pendentes = set(origens)
+        resultado = {}
+        inicio = destino * K
+        dist = {inicio: 0}
+        fila = [(0, inicio)]
+        explorados = relaxadas = 0
+        while fila and pendentes:
+            custo, estado = heapq.heappop(fila)
+            if custo > dist[estado]:
+                continue
+            explorados += 1
+            v, modal_seguinte = divmod(estado, K)
+            if v in pendentes:
+                pendentes.discard(v)
+                resultado[v] = custo
+                if not pendentes:
+                    break
+            for i in range(indptr[v], indptr[v + 1]):
+                p = posicoes[i]
+                if not ativa[p]:
+                    continue
+                modal_atual = modal[p] + 1
+                novo = custo + peso[p]
+                if modal_seguinte and modal_seguinte != modal_atual:
+                    novo += custo_transbordo
+                prox = origem[p] * K + modal_atual
+                if novo < dist.get(prox, float("inf")):
+                    dist[prox] = novo
+                    heapq.heappush(fila, (novo, prox))
+                    relaxadas += 1
+        self._contabilizar(explorados, relaxadas)
+        return resultado
+
+    def limites_ate(self, destinos: List[int], ativa=None) -> List[float]:
+        """
+        Menor soma de pesos (sem transbordo) de cada nó até o destino mais
+        próximo, pelas arestas ativas; inf = não alcança nenhum. Como o
+        transbordo só soma, é um potencial consistente para o A* do
+        dijkstra_modal, e continua válido com menos arestas ativas ou pesos
+        maiores (ex.: amostras de falha).
+        """
+        indptr, posicoes = self._csr_reversa()
+        origem, peso = self._origem, self._peso
+        ativa = self._ativa if ativa is None else ativa
+        dist = [float("inf")] * len(self.nos)
+        for d in destinos:
+            dist[d] = 0.0
+        fila = [(0.0, d) for d in set(destinos)]
+        explorados = relaxadas = 0
+        while fila:
+            custo, v = heapq.heappop(fila)
+            if custo > dist[v]:
+                continue
+            explorados += 1
+            for i in range(indptr[v], indptr[v + 1]):
+                p = posicoes[i]
+                if not ativa[p]:
+                    continue
+                novo = custo + peso[p]
+                u = origem[p]
+                if novo < dist[u]:
+                    dist[u] = novo
+                    heapq.heappush(fila, (novo, u))
+                    relaxadas += 1
+        self._contabilizar(explorados, relaxadas)
+        return dist
+
+    def custo_caminho(self, caminho: List[int], custo_transbordo: float):
+        """Custo modal de um caminho de ids e o código do modal da última aresta."""
+        custo = 0
+        modal_ant = -1
+        for u, v in zip(caminho, caminho[1:]):
+            p = self.posicao[(u, v)]
+            custo += self._peso[p]
+            if modal_ant != -1 and modal_ant != self._modal[p]:
+                custo += custo_transbordo
+            modal_ant = self._modal[p]
+        return custo, modal_ant
+
+    @staticmethod
+    def matriz_caminhos(caminhos: List[List[int]]) -> np.ndarray:
+        """Lista irregular de caminhos -> matriz (P, L) completada com -1."""
+        largura = max((len(c) for c in caminhos), default=0)
+        matriz = np.full((len(caminhos), max(largura, 1)), -1, dtype=np.int64)
+        for i, caminho in enumerate(caminhos):
+            matriz[i, : len(caminho)] = caminho
+        return matriz
+
+    def _posicoes_arestas(self, u: np.ndarray, v: np.ndarray):
+        """Posição de cada par (u, v) na CSR e máscara de existência."""
+        if self._chaves is None:
+            chaves = self.origem.astype(np.int64) * len(self.nos) + self.destino
+            ordem = np.argsort(chaves, kind="stable")
+            self._chaves = (chaves[ordem], ordem)
+        chaves, ordem = self._chaves
+        n = len(self.nos)
+        conhecido = (u >= 0) & (u < n) & (v >= 0) & (v < n)
+        chave = np.where(conhecido, u * n + v, -1)
+        if not len(chaves):
+            return np.zeros(u.shape, dtype=np.int64), np.zeros(u.shape, dtype=bool)
+        i = np.minimum(np.searchsorted(chaves, chave), len(chaves) - 1)
+        existe = conhecido & (chaves[i] == chave)
+        return np.where(existe, ordem[i], 0), existe
+
+    def avaliar_caminhos(
+        self, caminhos, custo_transbordo: float
+    ) -> Dict[str, np.ndarray]:
+        """
+        Avalia P caminhos de uma vez. `caminhos` é uma matriz (P, L) de ids
+        completada com -1 no fim de cada rota (ou uma lista irregular, ver
+        matriz_caminhos). Devolve arrays de tamanho P: custo (peso +
+        transbordos, igual a custo_caminho), peso, distancia, transbordos,
+        prob_falha combinada (1 - prod(1 - p)) e valido. Caminhos com aresta
+        inexistente ou bloqueada ficam com valido=False e custo infinito.
+
+        A soma corre trecho a trecho (uma coluna por vez) na mesma ordem do
+        cálculo escalar, então os custos coincidem bit a bit.
+        """
+        if not isinstance(caminhos, np.ndarray):
+            caminhos = self.matriz_caminhos(caminhos)
+        caminhos = np.asarray(caminhos, dtype=np.int64)
+        if caminhos.ndim != 2:
+            raise ValueError("caminhos deve ser uma matriz (P, L)")
+        u, v = caminhos[:, :-1], caminhos[:, 1:]
+        trecho = (u != -1) & (v != -1)
+        pos, existe = self._posicoes_arestas(u, v)
+        utilizavel = existe & self.ativa[pos]
+        valido = ~(trecho & ~utilizavel).any(axis=1)
+        trecho &= utilizavel
+
+        peso = np.where(trecho, self.peso[pos], 0.0)
+        distancia = np.where(trecho, self.distancia[pos], 0.0)
+        modal = self.modal[pos]
+        troca = np.zeros(trecho.shape, dtype=bool)
+        troca[:, 1:] = trecho[:, 1:] & trecho[:, :-1] & (modal[:, 1:] != modal[:, :-1])
+        transbordo = np.where(troca, float(custo_transbordo), 0.0)
+
+        P = len(caminhos)
+        custo, soma_peso, soma_distancia = np.zeros(P), np.zeros(P), np.zeros(P)
+        for j in range(trecho.shape[1]):
+            custo += peso[:, j]
+            custo += transbordo[:, j]
+            soma_peso += peso[:, j]
+            soma_distancia += distancia[:, j]
+        sobrevive = np.where(trecho, 1.0 - self.prob_falha[pos], 1.0).prod(axis=1)
+
+        custo[~valido] = np.inf
+        return {
+            "custo": custo,
+            "peso": soma_peso,
+            "distancia": soma_distancia,
+            "transbordos": troca.sum(axis=1),
+            "prob_falha": 1.0 - sobrevive,
+            "valido": valido,
+        }
+
+    def k_melhores(
+        self,
+        origem: int,
+        destinos: List[int],
+        k: int,
+        custo_transbordo: float,
+        disjuntas: bool = False,
+        max_sobreposicao: float = None,
+        max_candidatos: int = None,
+    ) -> List[Tuple[float, List[int]]]:
+        """
+        k melhores rotas simples (custo modal crescente) da origem a qualquer
+        destino, pelo algoritmo de Yen sobre o Dijkstra modal.
+
+        disjuntas=True exige rotas sem arestas em comum (cada rota aceita sai
+        da malha antes da próxima busca). max_sobreposicao (0..1) descarta
+        candidatas cuja fração de arestas compartilhadas com alguma rota já
+        aceita passe do limite; max_candidatos limita a enumeração do Yen.
+        """
+        base = self.ativa.copy()
+        aceitas = []
+
+        def _buscar(ativa, no, modal, custo):
+            r = self.dijkstra_modal(
+                no, destinos, custo_transbordo, ativa.tobytes(), modal, custo, True
+            )
+            return next(iter(r.values()), None)
+
+        if disjuntas:
+            while len(aceitas) < k:
+                achado = _buscar(base, origem, -1, 0)
+                if achado is None:
+                    break
+                aceitas.append(achado)
+                caminho = achado[1]
+                base[[self.posicao[e] for e in zip(caminho, caminho[1:])]] = False
+            return aceitas
+
+        def _arestas(caminho):
+            return set(zip(caminho, caminho[1:]))
+
+        def _diversa(caminho):
+            if max_sobreposicao is None:
+                return True
+            proprias = _arestas(caminho)
+            return all(
+                len(proprias & _arestas(c)) / max(len(proprias), 1) <= max_sobreposicao
+                for _, c in aceitas
+            )
+
+        max_candidatos = max_candidatos or k * 20
+        primeira = _buscar(base, origem, -1, 0)
+        if primeira is None:
+            return aceitas
+        encontradas = [primeira]  # Sequência do Yen (inclui as rejeitadas)
+        aceitas.append(primeira)
+        candidatas = []
+        vistas = {tuple(primeira[1])}
+        contador = 0
+        while len(aceitas) < k and len(encontradas) < max_candidatos:
+            ultima = encontradas[-1][1]
+            for i in range(len(ultima) - 1):
+                raiz = ultima[: i + 1]
+                ativa = base.copy()
+                for _, c in encontradas:
+                    if c[: i + 1] == raiz:
+                        ativa[self.posicao[(c[i], c[i + 1])]] = False
+                # Desvio não pode voltar à raiz (nem ao próprio nó de desvio)
+                ativa[np.isin(self.destino, raiz)] = False
+                custo_raiz, modal_raiz = self.custo_caminho(raiz, custo_transbordo)
+                achado = _buscar(ativa, raiz[-1], modal_raiz, custo_raiz)
+                if achado is None:
+                    continue
+                caminho = raiz[:-1] + achado[1]
+                if tuple(caminho) not in vistas:
+                    vistas.add(tuple(caminho))
+                    heapq.heappush(candidatas, (achado[0], contador, caminho))
+                    contador += 1
+            if not candidatas:
+                break
+            custo, _, caminho = heapq.heappop(candidatas)
+            encontradas.append((custo, caminho))
+            if _diversa(caminho):
+                aceitas.append((custo, caminho))
+        return aceitas
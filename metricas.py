@@ -0,0 +1,59 @@
+# Arquivo: metricas.py
+
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+
+class Metricas:
+    """
+    Instrumentação leve dos caminhos críticos: spans de tempo por nome
+    (chamadas, total e máximo) e contadores inteiros. Com ativo=False os
+    spans viram no-op.
+    """
+
+    def __init__(self, ativo: bool = True):
+        self.ativo = ativo
+        self.zerar()
+
+    def zerar(self):
+        self._spans = {}  # nome -> [chamadas, total_s, max_s]
+        self._contadores = {}
+
+    @contextmanager
+    def span(self, nome: str):
+        if not self.ativo:
+            yield
+            return
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar(nome, time.perf_counter() - inicio)
+
+    def registrar(self, nome: str, segundos: float):
+        span = self._spans.get(nome)
+        if span is None:
+            self._spans[nome] = [1, segundos, segundos]
+        else:
+            span[0] += 1
+            span[1] += segundos
+            span[2] = max(span[2], segundos)
+
+    def contar(self, nome: str, n: int = 1):
+        self._contadores[nome] = self._contadores.get(nome, 0) + n
+
+    def snapshot(self) -> Dict[str, dict]:
+        """Cópia serializável (JSON) do estado atual, tempos em ms."""
+        return {
+            "spans": {
+                nome: {
+                    "chamadas": n,
+                    "total_ms": total * 1000,
+                    "medio_ms": total * 1000 / n,
+                    "max_ms": maximo * 1000,
+                }
+                for nome, (n, total, maximo) in sorted(self._spans.items())
+            },
+            "contadores": dict(sorted(self._contadores.items())),
+        }
@@ -0,0 +1,180 @@
+# Arquivo: relatorio.py
+
+import argparse
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Dict, Iterable, List
+
+from core import COLORS, DESTINOS, ORIGEM, SoyLogisticsNet
+from lote import avaliar_cenario, executar_cenarios, gerar_cenarios, nivel_chuva
+
+logger = logging.getLogger("LogisticsReport")
+
+# Estado do desenho (processo principal): rede, figura e eixos reaproveitados
+# entre páginas (as camadas estáticas do mapa ficam retidas no eixo)
+_rede_desenho = None
+_pagina = None
+_custos_base = {}
+
+
+def nome_unico(prefixo: str, extensao: str, pasta: str = ".") -> str:
+    """Nome com data/hora completas e sufixo numérico se já existir."""
+    base = f"{prefixo}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    caminho = os.path.join(pasta, f"{base}.{extensao}")
+    n = 1
+    while os.path.exists(caminho):
+        caminho = os.path.join(pasta, f"{base}_{n}.{extensao}")
+        n += 1
+    return caminho
+
+
+def _preparar_desenho(json_path: str, tamanho=(16, 9)):
+    global _rede_desenho, _pagina
+    # Figure avulsa (sem pyplot) não depende do backend do processo
+    from matplotlib.figure import Figure
+    from matplotlib.gridspec import GridSpec
+
+    _rede_desenho = SoyLogisticsNet()
+    _rede_desenho.carregar_dados(json_path)
+    _custos_base.clear()
+
+    fig = Figure(figsize=tamanho, facecolor=COLORS["bg"])
+    gs = GridSpec(1, 3, figure=fig, wspace=0.1)
+    _pagina = (fig, fig.add_subplot(gs[0, :2]), fig.add_subplot(gs[0, 2]))
+
+
+def _custo_base(origem: str, destinos: List[str]) -> float:
+    # Referência do painel: mesma origem e portos, sem chuva e sem bloqueios
+    chave = (origem, tuple(destinos))
+    if chave not in _custos_base:
+        base = avaliar_cenario(_rede_desenho, {"origem": origem}, list(destinos))
+        _custos_base[chave] = base["custo"] or 0.0
+    return _custos_base[chave]
+
+
+def _desenhar(resultado: Dict):
+    """Desenha mapa + painel de um cenário já avaliado na figura retida."""
+    fig, ax_mapa, ax_painel = _pagina
+    rede = _rede_desenho
+    origem = resultado.get("origem", ORIGEM)
+    custo_base = _custo_base(origem, resultado.get("destinos", DESTINOS))
+    # A rota veio do pool; aqui só o clima e os bloqueios do desenho
+    nivel = nivel_chuva(resultado, rede)
+    rede.aplicar_nivel_chuva(nivel)
+    rede.definir_bloqueios({tuple(e) for e in resultado.get("bloqueios", [])})
+    rede.desenhar_mapa_interativo(
+        ax_mapa, rede.arestas_bloqueadas, resultado["caminho"]
+    )
+    rede.desenhar_painel_analitico(ax_painel, resultado["custo"] or 0, custo_base)
+    bloqueios = ", ".join(f"{u}->{v}" for u, v in resultado.get("bloqueios", []))
+    fig.suptitle(
+        f"Cenário {resultado.get('id', '')} | origem {origem} | "
+        f"{'tempo bom' if nivel == 'seco' else 'chuva ' + nivel} | "
+        f"bloqueios: {bloqueios or 'nenhum'}",
+        x=0.02,
+        ha="left",
+        fontsize=11,
+        color=COLORS["text"],
+    )
+    return fig
+
+
+def gravar_pdf(
+    json_path: str,
+    resultados: Iterable[Dict],
+    saida: str,
+    pasta_png: str = None,
+    dpi: int = 200,
+    titulo: str = None,
+) -> int:
+    """
+    Desenha uma página vetorial por cenário avaliado, na ordem recebida, em
+    um único PDF: rótulos e linhas continuam nítidos em qualquer zoom. As
+    camadas estáticas do mapa só são remontadas quando o clima muda entre
+    páginas seguidas. Com pasta_png, grava também cada página em PNG (dpi).
+    Devolve o nº de páginas.
+    """
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    _preparar_desenho(json_path)
+    if pasta_png:
+        os.makedirs(pasta_png, exist_ok=True)
+    paginas = 0
+    with PdfPages(saida) as pdf:
+        for resultado in resultados:
+            fig = _desenhar(resultado)
+            pdf.savefig(fig, facecolor=fig.get_facecolor())
+            if pasta_png:
+                nome = f"cenario_{resultado.get('id', paginas)}.png"
+                fig.savefig(
+                    os.path.join(pasta_png, nome),
+                    dpi=dpi,
+                    facecolor=fig.get_facecolor(),
+                )
+            paginas += 1
+        info = pdf.infodict()
+        info["Title"] = titulo or "Relatório de cenários logísticos"
+        info["CreationDate"] = datetime.now()
+    return paginas
+
+
+def gerar_relatorio(
+    json_path: str,
+    cenarios: List[Dict],
+    saida: str = None,
+    pasta_png: str = None,
+    processos: int = None,
+    dpi: int = 200,
+) -> str:
+    """
+    Relatório completo: as rotas saem do pool de lote.executar_cenarios e
+    as páginas são desenhadas em seguida, como vetor, em um PDF multipágina
+    (e, opcionalmente, um PNG por cenário).
+    """
+    resultados = executar_cenarios(json_path, cenarios, DESTINOS, processos)
+    saida = saida or nome_unico("relatorio", "pdf")
+    paginas = gravar_pdf(json_path, resultados, saida, pasta_png, dpi)
+    logger.info(f"Relatório com {paginas} páginas: {saida}")
+    return saida
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Relatório em lote (PDF vetorial multipágina/PNG) de cenários."
+    )
+    parser.add_argument("--dados", default="dados.json")
+    parser.add_argument(
+        "--cenarios",
+        help="Arquivo JSONL de cenários; sem ele, gera a varredura de lote.py.",
+    )
+    parser.add_argument("--origens", nargs="+", default=[ORIGEM])
+    parser.add_argument("--max-bloqueios", type=int, default=1)
+    parser.add_argument("--saida", help="PDF de saída (padrão: nome com data/hora).")
+    parser.add_argument(
+        "--png", metavar="PASTA", help="Grava também um PNG por página."
+    )
+    parser.add_argument("--processos", type=int, default=None)
+    parser.add_argument(
+        "--dpi", type=int, default=200, help="Resolução dos PNG (o PDF é vetorial)."
+    )
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+
+    if args.cenarios:
+        with open(args.cenarios, "r", encoding="utf-8") as f:
+            cenarios = [json.loads(linha) for linha in f if linha.strip()]
+    else:
+        rede = SoyLogisticsNet()
+        rede.carregar_dados(args.dados)
+        cenarios = list(gerar_cenarios(rede, args.origens, args.max_bloqueios))
+
+    saida = gerar_relatorio(
+        args.dados, cenarios, args.saida, args.png, args.processos, args.dpi
+    )
+    print(f"Salvo: {saida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+# Arquivo: risco.py
+
+import math
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from malha import MalhaCompacta
+
+OBJETIVOS = ("custo", "esperado", "risco", "confiabilidade")
+DESEMPATE = 1e-9  # Peso do custo no objetivo de confiabilidade (só desempata)
+
+
+def risco_aditivo(prob_falha) -> np.ndarray:
+    """-log(1 - p) por trecho: somado na rota dá -log(confiabilidade)."""
+    p = np.minimum(np.asarray(prob_falha, dtype=np.float64), 1.0)
+    with np.errstate(divide="ignore"):
+        return -np.log1p(-p)  # p = 1 (falha certa) vira inf
+
+
+def _com_risco(peso: np.ndarray, risco: np.ndarray, lambda_risco: float):
+    # Trecho de falha certa fica intransitável mesmo com lambda = 0
+    with np.errstate(invalid="ignore"):
+        return np.where(np.isinf(risco), np.inf, peso + lambda_risco * risco)
+
+
+def pesos_objetivo(
+    malha: MalhaCompacta,
+    objetivo: str,
+    custo_transbordo: float,
+    lambda_risco: float = 0.0,
+) -> Tuple[np.ndarray, float]:
+    """
+    Pesos por aresta e custo de transbordo que o Dijkstra modal minimiza:
+      custo           peso atual
+      esperado        peso / (1 - p): cada falha obriga a repetir o trecho
+      risco           peso + lambda_risco * (-log(1 - p))
+      confiabilidade  -log(1 - p), com o custo apenas desempatando
+    Como -log(1 - p) é aditivo, todos continuam sendo um caminho mínimo
+    comum sobre a malha CSR, sem enumerar rotas.
+    """
+    peso, prob = malha.peso, malha.prob_falha
+    if objetivo == "custo":
+        return peso.copy(), custo_transbordo
+    if objetivo == "esperado":
+        with np.errstate(divide="ignore"):
+            return np.where(prob < 1.0, peso / (1.0 - prob), np.inf), custo_transbordo
+    risco = risco_aditivo(prob)
+    if objetivo == "risco":
+        return _com_risco(peso, risco, lambda_risco), custo_transbordo
+    if objetivo == "confiabilidade":
+        return risco + DESEMPATE * peso, DESEMPATE * custo_transbordo
+    raise ValueError(f"Objetivo desconhecido: {objetivo} (use {', '.join(OBJETIVOS)})")
+
+
+def _buscar(malha, origem, destinos, pesos, custo_transbordo) -> Tuple[float, list]:
+    r = malha.dijkstra_modal(
+        origem, destinos, custo_transbordo, peso=pesos.tolist(), primeiro=True
+    )
+    return next(iter(r.values()), (float("inf"), []))
+
+
+def descrever_rotas(
+    malha: MalhaCompacta, caminhos: List[List[int]], custo_transbordo: float
+) -> List[Dict]:
+    """Custo real, probabilidade de falha e confiabilidade de cada rota (em lote)."""
+    if not caminhos:
+        return []
+    avaliacao = malha.avaliar_caminhos(caminhos, custo_transbordo)
+    rotas = []
+    for i, caminho in enumerate(caminhos):
+        vazio = not caminho
+        prob = 1.0 if vazio else float(avaliacao["prob_falha"][i])
+        rotas.append(
+            {
+                "custo": float("inf") if vazio else float(avaliacao["custo"][i]),
+                "prob_falha": prob,
+                "confiabilidade": 1.0 - prob,
+                "caminho": list(caminho),
+            }
+        )
+    return rotas
+
+
+def rota_objetivo(
+    malha: MalhaCompacta,
+    origem: int,
+    destinos: List[int],
+    custo_transbordo: float,
+    objetivo: str = "risco",
+    lambda_risco: float = 0.0,
+) -> Dict:
+    """Melhor rota segundo o objetivo, com o valor do objetivo e o custo real."""
+    pesos, transbordo = pesos_objetivo(malha, objetivo, custo_transbordo, lambda_risco)
+    valor, caminho = _buscar(malha, origem, destinos, pesos, transbordo)
+    rota = descrever_rotas(malha, [caminho], custo_transbordo)[0]
+    rota.update({"objetivo": objetivo, "valor": valor})
+    return rota
+
+
+def fronteira_pareto(
+    malha: MalhaCompacta,
+    origem: int,
+    destinos: List[int],
+    custo_transbordo: float,
+    max_rotas: int = 16,
+) -> List[Dict]:
+    """
+    Fronteira custo x confiabilidade por busca dicotômica no lambda: parte
+    da rota mais barata e da mais confiável e, para cada par vizinho da
+    fronteira, resolve custo + lambda * risco com o lambda em que os dois
+    empatam. Uma rota nova abaixo da reta entre eles entra e divide o
+    intervalo; senão o trecho está completo. Cada ponto custa um Dijkstra.
+    Só aparecem as rotas suportadas (na envoltória convexa da fronteira).
+    Devolve as rotas em custo crescente (e confiabilidade crescente).
+    """
+    peso = malha.peso
+    risco = risco_aditivo(malha.prob_falha)
+    extremos = [
+        _buscar(malha, origem, destinos, peso, custo_transbordo)[1],
+        _buscar(
+            malha,
+            origem,
+            destinos,
+            *pesos_objetivo(malha, "confiabilidade", custo_transbordo),
+        )[1],
+    ]
+    if not extremos[0]:
+        return []
+
+    pontos = {}  # caminho -> (custo, risco aditivo)
+
+    def _registrar(caminho):
+        rota = descrever_rotas(malha, [caminho], custo_transbordo)[0]
+        chave = tuple(caminho)
+        pontos[chave] = (rota["custo"], float(risco_aditivo(rota["prob_falha"])))
+        return chave
+
+    barata = _registrar(extremos[0])
+    pilha = [(barata, _registrar(extremos[1]))] if extremos[1] else []
+    while pilha and len(pontos) < max_rotas:
+        a, b = pilha.pop()
+        (ca, ra), (cb, rb) = pontos[a], pontos[b]
+        if not (cb > ca and ra > rb) or math.isinf(ra):
+            continue
+        lambda_risco = (cb - ca) / (ra - rb)
+        _, caminho = _buscar(
+            malha,
+            origem,
+            destinos,
+            _com_risco(peso, risco, lambda_risco),
+            custo_transbordo,
+        )
+        if not caminho or tuple(caminho) in pontos:
+            continue
+        c = _registrar(caminho)
+        cc, rc = pontos[c]
+        referencia = ca + lambda_risco * ra
+        if cc + lambda_risco * rc >= referencia - 1e-9 * max(1.0, abs(referencia)):
+            del pontos[c]  # Empate com a reta: nada novo entre a e b
+            continue
+        pilha.extend([(c, b), (a, c)])
+
+    # Filtro final de dominância (custo crescente, risco estritamente menor)
+    fronteira, menor_risco = [], float("inf")
+    for chave, (custo, r) in sorted(pontos.items(), key=lambda item: item[1]):
+        if r < menor_risco or not fronteira:
+            fronteira.append(list(chave))
+            menor_risco = r
+    return descrever_rotas(malha, fronteira, custo_transbordo)
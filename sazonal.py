@@ -0,0 +1,95 @@
+# Arquivo: sazonal.py
+
+from typing import List, Sequence
+
+import numpy as np
+
+from malha import MalhaCompacta
+
+MESES = [
+    "Jan",
+    "Fev",
+    "Mar",
+    "Abr",
+    "Mai",
+    "Jun",
+    "Jul",
+    "Ago",
+    "Set",
+    "Out",
+    "Nov",
+    "Dez",
+]
+
+
+class PerfilSazonal:
+    """
+    Perfis densos por aresta e período (arestas x períodos, na ordem da
+    malha CSR): peso absoluto e probabilidade de falha de cada trecho em
+    cada mês/semana do horizonte de planejamento.
+    """
+
+    def __init__(
+        self, periodos: Sequence[str], peso: np.ndarray, prob_falha: np.ndarray
+    ):
+        self.periodos = list(periodos)
+        self.peso = np.asarray(peso, dtype=np.float64)
+        self.prob_falha = np.asarray(prob_falha, dtype=np.float64)
+        if self.peso.shape != self.prob_falha.shape or self.peso.shape[1] != len(
+            self.periodos
+        ):
+            raise ValueError("Perfis devem ter formato (arestas, períodos).")
+
+    @classmethod
+    def constante(cls, malha: MalhaCompacta, periodos: Sequence[str] = MESES):
+        T = len(periodos)
+        return cls(
+            periodos,
+            np.repeat(malha.peso[:, None], T, axis=1),
+            np.repeat(malha.prob_falha[:, None], T, axis=1),
+        )
+
+
+def melhor_janela(
+    malha: MalhaCompacta,
+    perfil: PerfilSazonal,
+    origem: int,
+    destinos: List[int],
+    custo_transbordo: float,
+) -> dict:
+    """
+    Melhor rota em cada período do horizonte e o período de saída mais
+    barato. Cada viagem usa os custos do período de partida. Períodos com o
+    mesmo perfil de pesos compartilham uma única busca; o risco da rota em
+    cada período (1 - prod(1 - p)) sai de uma operação vetorizada.
+    """
+    T = len(perfil.periodos)
+    colunas, inversa = np.unique(perfil.peso.T, axis=0, return_inverse=True)
+    rotas = []
+    for pesos in colunas:
+        r = malha.dijkstra_modal(
+            origem, destinos, custo_transbordo, peso=pesos.tolist(), primeiro=True
+        )
+        rotas.append(next(iter(r.values()), (float("inf"), [])))
+
+    custos = np.array([rotas[i][0] for i in inversa.reshape(-1)], dtype=float)
+    caminhos = [rotas[i][1] for i in inversa.reshape(-1)]
+
+    # Incidência rota x aresta: risco acumulado de todos os períodos de uma vez
+    incidencia = np.zeros((T, malha.n_arestas), dtype=bool)
+    for t, caminho in enumerate(caminhos):
+        trechos = [malha.posicao[e] for e in zip(caminho, caminho[1:])]
+        incidencia[t, trechos] = True
+    sobrevive = np.where(incidencia, 1 - perfil.prob_falha.T, 1.0).prod(axis=1)
+    prob_falha = np.where(np.isfinite(custos), 1 - sobrevive, 1.0)
+
+    melhor = int(np.argmin(custos)) if T else -1
+    return {
+        "periodos": perfil.periodos,
+        "custos": custos,
+        "caminhos": caminhos,
+        "prob_falha": prob_falha,
+        "melhor_periodo": perfil.periodos[melhor] if T else None,
+        "melhor_custo": float(custos[melhor]) if T else float("inf"),
+        "melhor_caminho": caminhos[melhor] if T else [],
+    }
@@ -0,0 +1,312 @@
+# Arquivo: servico.py
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Tuple
+
+from carga import ler_rede
+from core import DESTINOS, ORIGEM, SoyLogisticsNet
+from lote import avaliar_lote, iniciar_worker, nivel_chuva
+
+logger = logging.getLogger("LogisticsService")
+
+STATUS_HTTP = {200: "OK", 400: "Bad Request", 404: "Not Found", 500: "Server Error"}
+
+
+def _preparar_arquivos(json_path: str, landmarks: int):
+    """Valida a malha e deixa prontos os caches em disco que os workers leem."""
+    if not landmarks:
+        ler_rede(json_path)
+        return
+    rede = SoyLogisticsNet()
+    rede.carregar_dados(json_path)
+    rede.preparar_landmarks(landmarks)
+
+
+def chave_cenario(cenario: Dict) -> Tuple:
+    """Forma canônica da consulta: a ordem de portos e bloqueios não importa."""
+    return (
+        cenario.get("origem", ORIGEM),
+        tuple(sorted(cenario.get("destinos", DESTINOS))),
+        nivel_chuva(cenario),
+        tuple(sorted(tuple(e) for e in cenario.get("bloqueios", []))),
+    )
+
+
+class ServicoRotas:
+    """
+    Serviço de rotas de longa duração: a malha fica carregada nos processos
+    do pool e cada consulta é um cenário (origem, destinos, clima, bloqueios)
+    avaliado por lote.avaliar_cenario.
+
+    Consultas idênticas simultâneas compartilham uma única computação. A
+    recarga cria um pool novo com o arquivo atualizado; o antigo termina o
+    que já recebeu antes de ser desligado, então nenhuma consulta em curso
+    é perdida.
+    """
+
+    def __init__(self, json_path: str, processos: int = None, landmarks: int = 0):
+        self.json_path = json_path
+        self.landmarks = landmarks  # Nº de landmarks ALT por worker (0 = sem ALT)
+        self.processos = processos or os.cpu_count() or 1
+        self.versao = 0
+        self._pool = None
+        self._mtime = None
+        self._em_andamento: Dict[Tuple, asyncio.Future] = {}
+        self.estatisticas = {"consultas": 0, "computadas": 0, "coalescidas": 0}
+
+    def _novo_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.processos,
+            initializer=iniciar_worker,
+            initargs=(self.json_path, DESTINOS, self.landmarks),
+        )
+
+    async def iniciar(self):
+        await self.recarregar()
+
+    async def recarregar(self) -> int:
+        """
+        Valida o arquivo (e atualiza os caches .npz/.alt.npz) fora do laço de
+        eventos e troca o pool. Se a leitura falhar, o pool atual continua
+        servindo.
+        """
+        loop = asyncio.get_running_loop()
+        mtime = os.stat(self.json_path).st_mtime_ns
+        await loop.run_in_executor(
+            None, _preparar_arquivos, self.json_path, self.landmarks
+        )
+
+        antigo, self._pool = self._pool, self._novo_pool()
+        self._mtime = mtime
+        self.versao += 1
+        if antigo is not None:
+            # Sem cancelar: tarefas já enviadas ao pool antigo terminam normalmente
+            antigo.shutdown(wait=False)
+        logger.info(f"Malha carregada: {self.json_path} (versão {self.versao})")
+        return self.versao
+
+    async def vigiar_arquivo(self, intervalo: float):
+        """Recarrega automaticamente quando o mtime do arquivo muda."""
+        while True:
+            await asyncio.sleep(intervalo)
+            try:
+                if os.stat(self.json_path).st_mtime_ns != self._mtime:
+                    await self.recarregar()
+            except (OSError, ValueError, KeyError) as e:
+                logger.error(f"Recarga ignorada: {e}")
+
+    async def consultar_lote(self, cenarios: List[Dict]) -> List[Dict]:
+        """
+        Avalia vários cenários. Os inéditos vão para o pool em blocos (um
+        envio por worker); os repetidos, dentro do lote ou já em curso,
+        aguardam a mesma computação.
+        """
+        loop = asyncio.get_running_loop()
+        self.estatisticas["consultas"] += len(cenarios)
+        chaves = [(self.versao,) + chave_cenario(c) for c in cenarios]
+
+        novas = []
+        for chave in dict.fromkeys(chaves):
+            if chave in self._em_andamento:
+                continue
+            self._em_andamento[chave] = loop.create_future()
+            novas.append(chave)
+        self.estatisticas["computadas"] += len(novas)
+        self.estatisticas["coalescidas"] += len(cenarios) - len(novas)
+
+        futuros = [self._em_andamento[c] for c in chaves]
+        tamanho = max(1, -(-len(novas) // self.processos))
+        blocos = [novas[i : i + tamanho] for i in range(0, len(novas), tamanho)]
+        for n, bloco in enumerate(blocos):
+            envio = [
+                {
+                    "origem": o,
+                    "destinos": list(d),
+                    "chuva": nivel != "seco",
+                    "nivel_chuva": nivel,
+                    "bloqueios": list(b),
+                }
+                for _, o, d, nivel, b in bloco
+            ]
+            pool = self._pool
+            try:
+                enviado = pool.submit(avaliar_lote, envio)
+            except Exception as e:
+                # Nada do que faltava enviar será resolvido: falha já, sem deixar
+                # futuros órfãos em que consultas idênticas ficariam presas
+                for pendente in blocos[n:]:
+                    for chave in pendente:
+                        self._em_andamento.pop(chave).set_exception(e)
+                if isinstance(e, BrokenProcessPool):
+                    self._reconstruir_pool(pool)
+                break
+            tarefa = asyncio.wrap_future(enviado)
+            tarefa.add_done_callback(
+                lambda t, bloco=bloco, pool=pool: self._concluir(bloco, t, pool)
+            )
+
+        # shield: o cancelamento de um cliente não derruba a consulta dos outros
+        return list(await asyncio.gather(*(asyncio.shield(f) for f in futuros)))
+
+    def _reconstruir_pool(self, quebrado: ProcessPoolExecutor):
+        """Troca um pool com worker morto (BrokenProcessPool) por um novo."""
+        if quebrado is not self._pool:
+            return  # Já trocado (recarga ou outra falha)
+        self._pool = self._novo_pool()
+        quebrado.shutdown(wait=False)
+        logger.error("Pool de processos quebrado: recriado")
+
+    def _concluir(
+        self, bloco: List[Tuple], tarefa: asyncio.Future, pool: ProcessPoolExecutor
+    ):
+        if not tarefa.cancelled() and isinstance(tarefa.exception(), BrokenProcessPool):
+            self._reconstruir_pool(pool)
+        for i, chave in enumerate(bloco):
+            futuro = self._em_andamento.pop(chave)
+            if tarefa.cancelled():
+                futuro.cancel()
+            elif tarefa.exception() is not None:
+                futuro.set_exception(tarefa.exception())
+            else:
+                futuro.set_result(tarefa.result()[i])
+
+    async def consultar(self, cenario: Dict) -> Dict:
+        return (await self.consultar_lote([cenario]))[0]
+
+    def saude(self) -> Dict:
+        return {
+            "dados": self.json_path,
+            "versao": self.versao,
+            "processos": self.processos,
+            "em_andamento": len(self._em_andamento),
+            **self.estatisticas,
+        }
+
+    def encerrar(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+
+    # --- HTTP mínimo (uma requisição por conexão) ---
+    async def atender(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            linha = (await reader.readline()).decode("latin-1").split()
+            cabecalhos = {}
+            while True:
+                cabecalho = await reader.readline()
+                if cabecalho in (b"\r\n", b"\n", b""):
+                    break
+                nome, _, valor = cabecalho.decode("latin-1").partition(":")
+                cabecalhos[nome.strip().lower()] = valor.strip()
+            tamanho = int(cabecalhos.get("content-length", 0))
+            corpo = await reader.readexactly(tamanho) if tamanho else b""
+            if len(linha) < 2:
+                status, resposta = 400, {"erro": "requisição inválida"}
+            else:
+                status, resposta = await self._rotear(linha[0], linha[1], corpo)
+        except (ValueError, asyncio.IncompleteReadError) as e:
+            status, resposta = 400, {"erro": str(e)}
+
+        dados = json.dumps(resposta, ensure_ascii=False).encode("utf-8")
+        writer.write(
+            (
+                f"HTTP/1.1 {status} {STATUS_HTTP[status]}\r\n"
+                "Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(dados)}\r\n"
+                "Connection: close\r\n\r\n"
+            ).encode("latin-1")
+            + dados
+        )
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def _rotear(self, metodo: str, caminho: str, corpo: bytes):
+        if metodo == "GET" and caminho == "/saude":
+            return 200, self.saude()
+        if metodo != "POST":
+            return 404, {"erro": f"{metodo} {caminho}"}
+        try:
+            if caminho == "/rota":
+                return 200, await self.consultar(json.loads(corpo or b"{}"))
+            if caminho == "/lote":
+                pedido = json.loads(corpo)
+                cenarios = pedido["cenarios"] if isinstance(pedido, dict) else pedido
+                return 200, {"resultados": await self.consultar_lote(cenarios)}
+            if caminho == "/recarregar":
+                return 200, {"versao": await self.recarregar()}
+        except (ValueError, KeyError, TypeError) as e:
+            return 400, {"erro": str(e)}
+        except Exception as e:  # Falha no worker: responde sem derrubar o serviço
+            logger.error(f"Erro ao atender {caminho}: {e}")
+            return 500, {"erro": str(e)}
+        return 404, {"erro": f"{metodo} {caminho}"}
+
+
+async def servir(
+    servico: ServicoRotas,
+    host: str = "127.0.0.1",
+    porta: int = 8765,
+    socket_unix: str = None,
+    intervalo_recarga: float = 0,
+):
+    await servico.iniciar()
+    if socket_unix:
+        servidor = await asyncio.start_unix_server(servico.atender, path=socket_unix)
+    else:
+        servidor = await asyncio.start_server(servico.atender, host, porta)
+    vigia = None
+    if intervalo_recarga > 0:
+        vigia = asyncio.create_task(servico.vigiar_arquivo(intervalo_recarga))
+    endereco = socket_unix or f"http://{host}:{porta}"
+    logger.info(f"Serviço de rotas em {endereco}")
+    try:
+        async with servidor:
+            await servidor.serve_forever()
+    finally:
+        if vigia is not None:
+            vigia.cancel()
+        servico.encerrar()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Serviço local de rotas (HTTP/JSON): /rota, /lote, /recarregar."
+    )
+    parser.add_argument("--dados", default="dados.json")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8765)
+    parser.add_argument("--socket", help="Escuta em um socket Unix em vez de TCP.")
+    parser.add_argument("--processos", type=int, default=None)
+    parser.add_argument(
+        "--landmarks",
+        type=int,
+        default=0,
+        help="Pré-processamento ALT com N landmarks (acelera consultas repetidas).",
+    )
+    parser.add_argument(
+        "--intervalo-recarga",
+        type=float,
+        default=2.0,
+        help="Segundos entre verificações do arquivo de dados (0 desativa).",
+    )
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+
+    servico = ServicoRotas(args.dados, args.processos, args.landmarks)
+    try:
+        asyncio.run(
+            servir(servico, args.host, args.porta, args.socket, args.intervalo_recarga)
+        )
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
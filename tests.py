@@ -1,7 +1,16 @@
 import unittest
 import os
+import copy
+import csv
 import json
-from core import SoyLogisticsNet
+import logging
+import subprocess
+import sys
+import tempfile
+import networkx as nx
+import numpy as np
+from carga import caminho_cache
+from core import CUSTO_TRANSBORDO, SoyLogisticsNet
 
 # Cria um arquivo de dados temporário para o teste não depender do arquivo real
 TEST_DATA_FILE = "dados_teste.json"
@@ -60,14 +69,16 @@ class TestLogisticaSoja(unittest.TestCase):
                 },
             ],
         }
+        cls.dados_mock = dados_mock
         with open(TEST_DATA_FILE, "w") as f:
             json.dump(dados_mock, f)
 
     @classmethod
     def tearDownClass(cls):
         """Limpa a bagunça depois dos testes."""
-        if os.path.exists(TEST_DATA_FILE):
-            os.remove(TEST_DATA_FILE)
+        for arquivo in (TEST_DATA_FILE, caminho_cache(TEST_DATA_FILE)):
+            if os.path.exists(arquivo):
+                os.remove(arquivo)
 
     def setUp(self):
         self.rede = SoyLogisticsNet()
@@ -78,6 +89,21 @@ class TestLogisticaSoja(unittest.TestCase):
         self.assertEqual(len(self.rede.graph.nodes), 5)
         self.assertTrue(self.rede.graph.has_edge("A", "B"))
 
+    def test_grafo_publico_somente_leitura(self):
+        """Testa se editar rede.graph falha em vez de ser ignorado pelo roteamento."""
+        with self.assertRaises(nx.NetworkXError):
+            self.rede.graph.remove_edge("A", "B")
+        with self.assertRaises(nx.NetworkXError):
+            self.rede.graph["A"]["B"]["weight"] = 1
+        self.rede.bloquear_aresta("A", "B")
+        self.assertFalse(self.rede.graph.has_edge("A", "B"))
+
+        # Cópia editável serve como grafo_custom
+        G = self.rede.graph.copy()
+        G["A"]["C"]["weight"] = 1
+        self.assertEqual(self.rede.buscar_melhor_rota("A", ["PORT_INVALIDO"], G)[0], 11)
+        self.assertEqual(self.rede.graph["A"]["C"]["weight"], 200)
+
     def test_calculo_custo_simples(self):
         """Testa a soma simples de uma rota rodoviária."""
         # A -> C -> PORT_INVALIDO = 200 + 10 = 210
@@ -99,6 +125,694 @@ class TestLogisticaSoja(unittest.TestCase):
         self.assertEqual(caminho, ["A", "B", "PORT_SANTOS"])
         self.assertEqual(custo, 162.50)
 
+    def test_melhor_rota_considera_transbordo(self):
+        """Testa se a busca penaliza a troca de modal ao escolher o caminho."""
+        # A->B->D pesa 20, mas troca Road->Rail (+12.50); A->C->D pesa 30 sem troca
+        G = nx.DiGraph()
+        G.add_edge("A", "B", weight=10, type="road")
+        G.add_edge("B", "D", weight=10, type="rail")
+        G.add_edge("A", "C", weight=15, type="road")
+        G.add_edge("C", "D", weight=15, type="road")
+        custo, caminho = self.rede.buscar_melhor_rota("A", ["D"], grafo_custom=G)
+        self.assertEqual(caminho, ["A", "C", "D"])
+        self.assertEqual(custo, 30)
+
+    def test_rotas_por_porto(self):
+        """Testa a tabela por porto gerada por uma única busca."""
+        custo, caminho, tabela = self.rede.buscar_rotas_por_porto(
+            "A", ["PORT_SANTOS", "PORT_INVALIDO", "NARNIA"]
+        )
+        self.assertEqual(custo, 162.50)
+        self.assertEqual(caminho, ["A", "B", "PORT_SANTOS"])
+        self.assertEqual(tabela["PORT_INVALIDO"], (210, ["A", "C", "PORT_INVALIDO"]))
+        self.assertEqual(tabela["NARNIA"], (float("inf"), []))
+
+    def test_clima_incremental_com_bloqueio(self):
+        """Testa se chuva e bloqueios são camadas aplicadas e revertidas."""
+        self.rede.definir_bloqueios({("A", "B")})
+        self.rede.aplicar_condicoes_climaticas(True)
+        self.assertFalse(self.rede.graph.has_edge("A", "B"))
+        self.assertAlmostEqual(self.rede.graph["A"]["C"]["weight"], 220)
+
+        # Desbloquear durante a chuva restaura a aresta já penalizada
+        self.rede.definir_bloqueios(set())
+        self.assertAlmostEqual(self.rede.graph["A"]["B"]["weight"], 110)
+
+        self.rede.aplicar_condicoes_climaticas(False)
+        self.assertEqual(self.rede.graph["A"]["B"]["weight"], 100)
+        self.assertEqual(self.rede.graph["A"]["C"]["weight"], 200)
+        self.assertEqual(self.rede._initial_graph["A"]["B"]["weight"], 100)
+
+    def test_cache_rotas(self):
+        """Testa hits/misses do cache de rotas e a invalidação no recarregamento."""
+        self.rede.buscar_melhor_rota("A", ["PORT_SANTOS"])
+        self.rede.definir_bloqueios({("A", "B")})
+        custo, _ = self.rede.buscar_melhor_rota("A", ["PORT_SANTOS"])
+        self.assertEqual(custo, float("inf"))
+        self.rede.definir_bloqueios(set())
+        custo, caminho = self.rede.buscar_melhor_rota("A", ["PORT_SANTOS"])
+        self.assertEqual((custo, caminho), (162.50, ["A", "B", "PORT_SANTOS"]))
+        stats = self.rede.estatisticas_cache()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 2))
+
+        self.rede.carregar_dados(TEST_DATA_FILE)
+        self.assertEqual(self.rede.estatisticas_cache()["tamanho"], 0)
+
+    def test_clique_aresta_mais_proxima(self):
+        """Testa o índice espacial: empate, bloqueio e tolerância."""
+        # A-B e A-C se sobrepõem na diagonal: o empate fica com a primeira aresta
+        self.assertEqual(self.rede._find_closest_edge(0.5, 0.5), ("A", "B"))
+        self.rede.definir_bloqueios({("A", "B")})
+        self.assertEqual(self.rede._find_closest_edge(0.5, 0.5), ("A", "C"))
+        self.assertIsNone(self.rede._find_closest_edge(10, 10))
+
+    def test_renderizacao_retida(self):
+        """Testa se quadros seguintes reaproveitam as camadas estáticas do mapa."""
+        from matplotlib.figure import Figure
+
+        ax = Figure().add_subplot()
+        self.rede.desenhar_mapa_interativo(ax, set(), [])
+        legenda = ax.get_legend()
+        patches_iniciais = len(ax.patches)
+
+        dinamicos = self.rede.desenhar_mapa_interativo(
+            ax, {("A", "C")}, ["A", "B"], caminho_parcial=["A", "B"], animado=True
+        )
+        self.assertIs(ax.get_legend(), legenda)
+        self.assertTrue(all(a.get_animated() for a in dinamicos))
+        camadas = self.rede._camadas_render[ax]
+        self.assertFalse(camadas["arestas"][("A", "C")].get_visible())
+        # 1 trecho de rota + 1 sobreposição de bloqueio
+        self.assertEqual(len(ax.patches), patches_iniciais + 2)
+
+        # Mudança de clima invalida as camadas estáticas
+        self.rede.aplicar_condicoes_climaticas(True)
+        self.rede.desenhar_mapa_interativo(ax, set(), [])
+        self.assertIsNot(ax.get_legend(), legenda)
+        self.assertEqual(len(self.rede.tempos_quadros), 3)
+
+    def test_simulacao_falhas(self):
+        """Testa o Monte Carlo com probabilidades de falha extremas."""
+        destinos = ["PORT_SANTOS", "PORT_INVALIDO"]
+        malha = self.rede._malha
+        malha.prob_falha[malha.posicao_aresta("A", "B")] = 1.0
+        res = self.rede.simular_falhas("A", destinos, n_amostras=500, semente=1)
+        self.assertEqual(res["custo_esperado"], 210)
+        self.assertEqual(res["prob_sem_rota"], 0)
+        self.assertEqual(res["uso_arestas"][("A", "C")], 1.0)
+        self.assertEqual(res["uso_portos"], {"PORT_INVALIDO": 1.0})
+
+        malha.prob_falha[malha.posicao_aresta("A", "C")] = 1.0
+        res = self.rede.simular_falhas("A", destinos, n_amostras=500, semente=1)
+        self.assertEqual(res["prob_sem_rota"], 1.0)
+
+        # Agrupamento por arestas-chave bate com um Dijkstra por amostra
+        malha.prob_falha[:] = 0.4
+        res = self.rede.simular_falhas("A", destinos, n_amostras=300, semente=7)
+        falhas = np.random.default_rng(7).random((malha.n_arestas, 300)) < 0.4
+        custos = []
+        for s in range(300):
+            r = malha.dijkstra_modal(
+                malha.indice["A"],
+                [malha.indice[d] for d in ("PORT_SANTOS", "PORT_INVALIDO")],
+                CUSTO_TRANSBORDO,
+                (malha.ativa & ~falhas[:, s]).tobytes(),
+                primeiro=True,
+            )
+            custos.append(next(iter(r.values()), (float("inf"), []))[0])
+        custos = np.array(custos)
+        viaveis = custos[np.isfinite(custos)]
+        self.assertAlmostEqual(res["custo_esperado"], viaveis.mean())
+        self.assertAlmostEqual(res["prob_sem_rota"], 1 - viaveis.size / 300)
+
+    def test_varredura_em_lote(self):
+        """Testa a varredura de cenários no pool de processos."""
+        from lote import executar_cenarios, gerar_cenarios
+
+        cenarios = list(gerar_cenarios(self.rede, ["A"], max_bloqueios=1))
+        self.assertEqual(len(cenarios), 2 * (1 + 4))  # clima x (nenhum + 4 arestas)
+        resultados = list(
+            executar_cenarios(TEST_DATA_FILE, cenarios, ["PORT_SANTOS"], processos=2)
+        )
+        self.assertEqual([r["id"] for r in resultados], [c["id"] for c in cenarios])
+        self.assertEqual(resultados[0]["custo"], 162.50)
+        bloqueado = next(r for r in resultados if r["bloqueios"] == [["A", "B"]])
+        self.assertIsNone(bloqueado["custo"])
+
+        # No próprio processo o log de quem chamou fica intacto
+        nucleo = logging.getLogger("LogisticsCore")
+        nivel = nucleo.level
+        list(executar_cenarios(TEST_DATA_FILE, cenarios[:1], processos=1))
+        self.assertEqual(nucleo.level, nivel)
+
+    def test_modo_headless_sem_matplotlib(self):
+        """Testa o modo headless: JSON na saída e matplotlib não importado."""
+        raiz = os.path.dirname(os.path.abspath(__file__))
+        # Como `python main.py`: o script não pode ser importado de novo como main
+        codigo = (
+            "import runpy, sys; sys.argv[0] = 'main.py'; "
+            f"runpy.run_path({os.path.join(raiz, 'main.py')!r}, run_name='__main__'); "
+            "print('matplotlib' in sys.modules, 'main' in sys.modules)"
+        )
+        cenario = json.dumps({"origem": "A", "destinos": ["PORT_SANTOS"]})
+        with tempfile.TemporaryDirectory() as pasta:  # simulacao.log vai para lá
+            saida = subprocess.run(
+                [sys.executable, "-c", codigo, "--headless"]
+                + ["--dados", os.path.abspath(TEST_DATA_FILE), "--scenario", cenario],
+                cwd=pasta,
+                env={**os.environ, "PYTHONPATH": raiz},
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout
+        corpo, modulos = saida.rsplit("}", 1)
+        self.assertEqual(json.loads(corpo + "}")["custo"], 162.50)
+        self.assertEqual(modulos.split(), ["False", "False"])
+
+    def test_malha_compacta_acompanha_camadas(self):
+        """Testa se a forma CSR reflete clima e bloqueios do grafo público."""
+        malha = self.rede._malha
+        self.assertEqual(malha.n_arestas, 4)
+        self.assertEqual(malha.peso.dtype, np.float64)
+        self.assertEqual(malha.modal.dtype, np.int8)
+
+        p = malha.posicao_aresta("A", "C")
+        self.rede.aplicar_condicoes_climaticas(True)
+        self.assertEqual(malha.peso[p], self.rede.graph["A"]["C"]["weight"])
+        self.rede.definir_bloqueios({("A", "C")})
+        self.assertFalse(malha.ativa[p])
+        self.rede.definir_bloqueios(set())
+        self.assertTrue(malha.ativa[p])
+
+    def test_k_melhores_rotas(self):
+        """Testa rotas alternativas com e sem restrição de diversidade."""
+        rotas = self.rede.buscar_k_melhores_rotas(
+            "A", ["PORT_SANTOS", "PORT_INVALIDO"], k=3
+        )
+        self.assertEqual(
+            rotas,
+            [
+                (162.50, ["A", "B", "PORT_SANTOS"]),
+                (210, ["A", "C", "PORT_INVALIDO"]),
+            ],
+        )
+
+        G = nx.DiGraph()
+        for u, v, w in [
+            ("A", "B", 1),
+            ("B", "D", 1),
+            ("B", "E", 1),
+            ("E", "D", 1),
+            ("A", "F", 5),
+            ("F", "D", 5),
+        ]:
+            G.add_edge(u, v, weight=w, type="road")
+
+        def caminhos(**kw):
+            rotas = self.rede.buscar_k_melhores_rotas(
+                "A", ["D"], 2, grafo_custom=G, **kw
+            )
+            return [c for _, c in rotas]
+
+        self.assertEqual(caminhos(), [["A", "B", "D"], ["A", "B", "E", "D"]])
+        self.assertEqual(caminhos(disjuntas=True), [["A", "B", "D"], ["A", "F", "D"]])
+        self.assertEqual(
+            caminhos(max_sobreposicao=0.3), [["A", "B", "D"], ["A", "F", "D"]]
+        )
+
+    def test_ranking_criticidade(self):
+        """Testa o aumento de custo ao remover arestas simples e pares."""
+        ranking = self.rede.ranking_criticidade("A", ["PORT_SANTOS", "PORT_INVALIDO"])
+        self.assertEqual(ranking["custo_base"], 162.50)
+        primeira = ranking["arestas"][0]
+        self.assertIn(primeira["arestas"], [[("A", "B")], [("B", "PORT_SANTOS")]])
+        self.assertEqual(primeira["aumento"], 210 - 162.50)
+        self.assertEqual(ranking["arestas"][-1]["aumento"], 0)
+        self.assertEqual(ranking["pares"][0]["custo"], float("inf"))
+        # A malha e a rota voltam intactas depois dos reparos provisórios
+        self.assertTrue(self.rede._malha.ativa.all())
+        self.assertEqual(self.rede.buscar_melhor_rota("A", ["PORT_SANTOS"])[0], 162.50)
+
+        # Sem A->C, A->B e B->PORT_SANTOS são pontes: ficam fora dos pares
+        self.rede.bloquear_aresta("A", "C")
+        ranking = self.rede.ranking_criticidade("A", ["PORT_SANTOS"])
+        self.assertEqual(ranking["arestas"][0]["custo"], float("inf"))
+        self.assertEqual(ranking["pares"], [])
+
+    def test_matriz_custos(self):
+        """Testa a matriz origens x portos obtida por buscas reversas."""
+        matriz, melhores = self.rede.matriz_custos(
+            ["A", "B", "C", "NARNIA"], ["PORT_SANTOS", "PORT_INVALIDO"]
+        )
+        inf = float("inf")
+        np.testing.assert_array_equal(
+            matriz, [[162.50, 210], [50, inf], [inf, 10], [inf, inf]]
+        )
+        np.testing.assert_array_equal(melhores, [0, 0, 1, -1])
+
+    def test_planejamento_fluxo_capacitado(self):
+        """Testa a divisão do volume quando a rota mais barata satura."""
+        dados = copy.deepcopy(self.dados_mock)
+        dados["edges"][0]["capacity"] = 300  # A->B
+        dados["port_capacity"] = {"PORT_INVALIDO": 500}
+        with tempfile.TemporaryDirectory() as pasta:
+            arquivo = os.path.join(pasta, "dados_capacidade.json")
+            with open(arquivo, "w") as f:
+                json.dump(dados, f)
+            self.rede.carregar_dados(arquivo)
+
+        plano = self.rede.planejar_fluxo("A", ["PORT_SANTOS", "PORT_INVALIDO"], 1000)
+        self.assertEqual(
+            [(r["caminho"][-1], r["volume"]) for r in plano["rotas"]],
+            [("PORT_SANTOS", 300), ("PORT_INVALIDO", 500)],
+        )
+        self.assertEqual(plano["nao_alocado"], 200)
+        self.assertEqual(plano["custo_total"], 300 * 162.50 + 500 * 210)
+
+        # Capacidade 0 fecha o corredor (não é "sem limite")
+        dados["edges"][0]["capacity"] = 0
+        with tempfile.TemporaryDirectory() as pasta:
+            arquivo = os.path.join(pasta, "dados_fechado.json")
+            with open(arquivo, "w") as f:
+                json.dump(dados, f)
+            self.rede.carregar_dados(arquivo)
+            malha = self.rede._malha
+            self.assertEqual(malha.capacidade[malha.posicao_aresta("A", "B")], 0)
+            plano = self.rede.planejar_fluxo("A", ["PORT_SANTOS"], 100)
+            self.assertEqual(plano["rotas"], [])
+            self.assertEqual(plano["nao_alocado"], 100)
+
+            self.rede.carregar_dados(arquivo)  # Do cache .npz: continua fechado
+            malha = self.rede._malha
+            self.assertEqual(malha.capacidade[malha.posicao_aresta("A", "B")], 0)
+
+    def test_carga_streaming_e_cache_binario(self):
+        """Testa JSON Lines, CSV e o reaproveitamento do cache .npz."""
+        with tempfile.TemporaryDirectory() as pasta:
+            jsonl = os.path.join(pasta, "malha.jsonl")
+            with open(jsonl, "w") as f:
+                for no, xy in self.dados_mock["nodes"].items():
+                    f.write(json.dumps({"node": no, "pos": xy}) + "\n")
+                for aresta in self.dados_mock["edges"]:
+                    f.write(json.dumps(aresta) + "\n")
+            planilha = os.path.join(pasta, "malha.csv")
+            with open(planilha, "w", newline="") as f:
+                campos = ["u", "v", "weight", "distance", "label", "info", "type"]
+                writer = csv.DictWriter(f, fieldnames=campos)
+                writer.writeheader()
+                writer.writerows(self.dados_mock["edges"])
+
+            hashes = []
+            for arquivo in (jsonl, planilha, jsonl):  # 2ª leitura do .jsonl: cache
+                rede = SoyLogisticsNet()
+                rede.carregar_dados(arquivo)
+                self.assertTrue(os.path.exists(caminho_cache(arquivo)))
+                self.assertIsNone(rede._grafo_base)  # networkx só sob demanda
+                clique = None if arquivo == planilha else ("A", "B")  # CSV sem x/y
+                self.assertEqual(rede._find_closest_edge(1.0, 0.0), clique)
+                self.assertEqual(rede.graph["A"]["B"]["label"], "Road1")
+                self.assertEqual(
+                    rede.buscar_melhor_rota("A", ["PORT_SANTOS"])[0], 162.50
+                )
+                hashes.append(rede._hash_dados)
+            self.assertEqual(rede.pos["C"], (2, 2))
+            self.assertEqual(hashes[0], hashes[2])
+
+    def test_melhor_janela_sazonal(self):
+        """Testa a escolha do período de saída com perfis de chuva e safra."""
+        perfil = self.rede.perfil_sazonal(
+            ["P1", "P2", "P3"],
+            periodos_chuva=["P2"],
+            periodos_safra=["P3"],
+            fator_safra=2.0,
+        )
+        self.assertEqual(perfil.peso.shape, (4, 3))
+        janela = self.rede.buscar_melhor_janela("A", ["PORT_SANTOS"], perfil)
+        # P2: rodovia A->B +10%; P3: rodovia A->B em dobro
+        np.testing.assert_allclose(janela["custos"], [162.50, 172.50, 262.50])
+        self.assertEqual(janela["melhor_periodo"], "P1")
+        self.assertEqual(janela["melhor_caminho"], ["A", "B", "PORT_SANTOS"])
+
+    def test_malha_sintetica_benchmark(self):
+        """Testa o gerador de malhas sintéticas usado no benchmark."""
+        from benchmark import gerar_malha_sintetica
+
+        dados, origem, destinos = gerar_malha_sintetica(100, frac_ferrovia=0.3)
+        self.assertEqual(len(dados["nodes"]), 100)
+        self.assertEqual(len(dados["edges"]), 2 * 2 * 10 * 9)
+        self.assertEqual({e["type"] for e in dados["edges"]}, {"road", "rail"})
+        with tempfile.TemporaryDirectory() as pasta:
+            arquivo = os.path.join(pasta, "sintetica.json")
+            with open(arquivo, "w", encoding="utf-8") as f:
+                json.dump(dados, f)
+            rede = SoyLogisticsNet()
+            rede.carregar_dados(arquivo, usar_cache=False)
+        custo, caminho = rede.buscar_melhor_rota(origem, destinos)
+        self.assertLess(custo, float("inf"))
+        self.assertIn(caminho[-1], destinos)
+
+    def test_snapshot_metricas(self):
+        """Testa spans e contadores da instrumentação dos caminhos críticos."""
+        self.rede.zerar_metricas()
+        self.rede.limpar_cache_rotas()
+        self.rede.aplicar_condicoes_climaticas(True)
+        self.rede.buscar_melhor_rota("A", ["PORT_SANTOS"])
+        self.rede.buscar_melhor_rota("A", ["PORT_SANTOS"])  # Cache: sem nova busca
+        self.rede._calcular_custo_manual(["A", "B", "PORT_SANTOS"])
+        self.rede.aplicar_condicoes_climaticas(False)
+
+        snapshot = self.rede.snapshot_metricas()
+        json.dumps(snapshot)  # Serializável
+        spans, contadores = snapshot["spans"], snapshot["contadores"]
+        self.assertEqual(spans["clima"]["chamadas"], 2)
+        self.assertEqual(spans["roteamento"]["chamadas"], 1)
+        self.assertEqual(spans["custo"]["chamadas"], 1)
+        self.assertEqual(contadores["busca.buscas"], 1)
+        self.assertGreater(contadores["busca.estados_explorados"], 0)
+        self.assertGreaterEqual(
+            contadores["busca.arestas_relaxadas"],
+            contadores["busca.estados_explorados"] - 1,
+        )
+        self.assertIn("hits", snapshot["cache_rotas"])
+
+        self.rede.zerar_metricas()
+        self.assertEqual(self.rede.snapshot_metricas()["spans"], {})
+
+    def test_servico_rotas_coalescencia_e_recarga(self):
+        """Testa o serviço assíncrono: coalescência, lote, HTTP e recarga."""
+        import asyncio
+        from concurrent.futures.process import BrokenProcessPool
+        from servico import ServicoRotas
+
+        cenario = {"origem": "A", "destinos": ["PORT_SANTOS", "PORT_INVALIDO"]}
+
+        async def _http(porta, metodo, caminho, corpo=b""):
+            reader, writer = await asyncio.open_connection("127.0.0.1", porta)
+            writer.write(
+                f"{metodo} {caminho} HTTP/1.1\r\nContent-Length: {len(corpo)}"
+                "\r\n\r\n".encode() + corpo
+            )
+            resposta = await reader.read()
+            writer.close()
+            cabecalho, _, dados = resposta.partition(b"\r\n\r\n")
+            return int(cabecalho.split()[1]), json.loads(dados)
+
+        async def _roteiro():
+            servico = ServicoRotas(TEST_DATA_FILE, processos=1)
+            await servico.iniciar()
+            try:
+                iguais = await asyncio.gather(
+                    *(servico.consultar(dict(cenario)) for _ in range(4)),
+                    servico.consultar(
+                        {"origem": "A", "destinos": ["PORT_INVALIDO", "PORT_SANTOS"]}
+                    ),
+                )
+                lote = await servico.consultar_lote(
+                    [cenario, {**cenario, "bloqueios": [["B", "PORT_SANTOS"]]}]
+                )
+
+                servidor = await asyncio.start_server(servico.atender, "127.0.0.1", 0)
+                porta = servidor.sockets[0].getsockname()[1]
+                em_curso = asyncio.create_task(
+                    _http(porta, "POST", "/rota", json.dumps(cenario).encode())
+                )
+                await asyncio.sleep(0)
+                recarga = await _http(porta, "POST", "/recarregar")
+                http_rota = await em_curso
+                saude = await _http(porta, "GET", "/saude")
+                invalido = await _http(porta, "POST", "/rota", b"{")
+                servidor.close()
+                await servidor.wait_closed()
+
+                # Worker morto: a consulta falha, nada fica pendurado e o pool volta
+                class _PoolQuebrado:
+                    def submit(self, *args, **kwargs):
+                        raise BrokenProcessPool("worker morreu")
+
+                    def shutdown(self, wait=True):
+                        pass
+
+                servico._pool.shutdown()
+                servico._pool = _PoolQuebrado()
+                with self.assertRaises(BrokenProcessPool):
+                    await servico.consultar({"origem": "A"})
+                self.assertEqual(servico._em_andamento, {})
+                self.assertNotIsInstance(servico._pool, _PoolQuebrado)
+                depois = await asyncio.wait_for(servico.consultar(cenario), 60)
+                self.assertEqual(depois["custo"], 162.50)
+                return iguais, lote, http_rota, recarga, saude, invalido
+            finally:
+                servico.encerrar()
+
+        iguais, lote, http_rota, recarga, saude, invalido = asyncio.run(_roteiro())
+        self.assertTrue(all(r == iguais[0] for r in iguais))
+        self.assertEqual(iguais[0]["custo"], 162.50)
+        self.assertEqual(lote[0], iguais[0])
+        self.assertEqual(lote[1]["porto"], "PORT_INVALIDO")
+        self.assertEqual(http_rota, (200, iguais[0]))
+        self.assertEqual(recarga, (200, {"versao": 2}))
+        self.assertEqual(saude[1]["coalescidas"], 4)
+        self.assertEqual(invalido[0], 400)
+
+    def test_avaliacao_caminhos_em_lote(self):
+        """Testa o cálculo vetorizado contra o _calcular_custo_manual."""
+        caminhos = [
+            ["A", "B", "PORT_SANTOS"],
+            ["A", "C", "PORT_INVALIDO"],
+            ["A"],
+            ["A", "PORT_SANTOS"],  # Aresta inexistente
+            ["A", "NARNIA"],
+        ]
+        self.rede.aplicar_condicoes_climaticas(True)
+        try:
+            lote = self.rede.avaliar_caminhos(caminhos)
+            for i in range(3):
+                self.assertEqual(
+                    lote["custo"][i], self.rede._calcular_custo_manual(caminhos[i])
+                )
+        finally:
+            self.rede.aplicar_condicoes_climaticas(False)
+        np.testing.assert_array_equal(lote["valido"], [True, True, True, False, False])
+        np.testing.assert_array_equal(lote["transbordos"][:3], [1, 0, 0])
+        np.testing.assert_array_equal(lote["distancia"][:3], [150, 210, 0])
+        self.assertEqual(lote["custo"][3], float("inf"))
+
+        # Matriz de ids completada com -1 e bloqueio respeitado
+        malha = self.rede._malha
+        ids = malha.matriz_caminhos(
+            [[malha.indice[n] for n in c] for c in caminhos[:2]]
+        )
+        self.rede.bloquear_aresta("A", "C")
+        try:
+            lote = self.rede.avaliar_caminhos(ids)
+        finally:
+            self.rede.desbloquear_aresta("A", "C")
+        np.testing.assert_array_equal(lote["valido"], [True, False])
+        self.assertEqual(lote["custo"][0], 162.50)
+
+    def test_relatorio_pdf_em_lote(self):
+        """Testa o relatório multipágina (Agg) e os nomes de arquivo únicos."""
+        import relatorio
+        from relatorio import gerar_relatorio, nome_unico
+
+        cenarios = [
+            {"id": 0, "origem": "A", "destinos": ["PORT_SANTOS"], "chuva": True},
+            {"id": 1, "origem": "A", "destinos": ["PORT_SANTOS"]},
+            {"id": 2, "origem": "A", "bloqueios": [["A", "B"]]},
+        ]
+        with tempfile.TemporaryDirectory() as pasta:
+            saida = gerar_relatorio(
+                TEST_DATA_FILE,
+                cenarios,
+                os.path.join(pasta, "relatorio.pdf"),
+                pasta_png=os.path.join(pasta, "png"),
+                processos=1,
+                dpi=30,
+            )
+            with open(saida, "rb") as f:
+                pdf = f.read()
+            self.assertEqual(pdf.count(b"/Type /Page") - pdf.count(b"/Type /Pages"), 3)
+            self.assertNotIn(b"/Subtype /Image", pdf)  # Páginas vetoriais
+            self.assertEqual(
+                sorted(os.listdir(os.path.join(pasta, "png"))),
+                ["cenario_0.png", "cenario_1.png", "cenario_2.png"],
+            )
+            # Meta do painel usa os portos do próprio cenário
+            self.assertEqual(relatorio._custos_base[("A", ("PORT_SANTOS",))], 162.5)
+
+            primeiro = nome_unico("report", "pdf", pasta)
+            open(primeiro, "w").close()
+            self.assertNotEqual(nome_unico("report", "pdf", pasta), primeiro)
+
+    def test_landmarks_alt(self):
+        """Testa o A* com landmarks: mesmos custos, cache em disco e fallback."""
+        from landmarks import caminho_landmarks
+
+        with tempfile.TemporaryDirectory() as pasta:
+            arquivo = os.path.join(pasta, "malha.json")
+            with open(arquivo, "w", encoding="utf-8") as f:
+                json.dump(self.dados_mock, f)
+            rede = SoyLogisticsNet()
+            rede.carregar_dados(arquivo)
+            destinos = ["PORT_SANTOS", "PORT_INVALIDO"]
+            esperado = rede.buscar_rotas_por_porto("A", destinos)[2]
+
+            rede.preparar_landmarks(2)
+            self.assertTrue(os.path.exists(caminho_landmarks(arquivo)))
+            self.assertEqual(len(rede.preparar_landmarks(2).marcos), 2)  # Do disco
+            rede.limpar_cache_rotas()
+            self.assertEqual(rede.buscar_rotas_por_porto("A", destinos)[2], esperado)
+
+            # Chuva e bloqueios só encarecem: os limites continuam válidos
+            rede.aplicar_condicoes_climaticas(True)
+            rede.bloquear_aresta("B", "PORT_SANTOS")
+            custo, caminho = rede.buscar_melhor_rota("A", destinos)
+            self.assertEqual(caminho, ["A", "C", "PORT_INVALIDO"])
+            self.assertEqual(custo, 200 * 1.1 + 10 * 1.1)
+            self.assertEqual(rede.snapshot_metricas()["contadores"]["busca.alt"], 2)
+
+            # Peso abaixo do pré-processado: volta ao Dijkstra puro
+            rede.desbloquear_aresta("B", "PORT_SANTOS")
+            rede.aplicar_condicoes_climaticas(False)
+            rede._malha.atualizar_aresta("A", "B", {"weight": 1})
+            rede.limpar_cache_rotas()
+            self.assertFalse(rede._landmarks_utilizaveis())
+            self.assertEqual(rede.buscar_melhor_rota("A", ["PORT_SANTOS"])[0], 63.50)
+
+    def test_reroteamento_incremental(self):
+        """Testa a árvore de rotas reparada a cada bloqueio, desbloqueio e clima."""
+        destinos = ["PORT_SANTOS", "PORT_INVALIDO"]
+
+        def _tabela_completa():
+            return self.rede._tabela_malha(
+                self.rede._malha, "A", destinos, self.rede._malha.ativa.tobytes()
+            )
+
+        self.rede.zerar_metricas()
+        self.rede.acompanhar_origem("A")
+        try:
+            for passo in (
+                lambda: self.rede.bloquear_aresta("B", "PORT_SANTOS"),
+                lambda: self.rede.aplicar_condicoes_climaticas(True),
+                lambda: self.rede.bloquear_aresta("A", "C"),
+                lambda: self.rede.desbloquear_aresta("B", "PORT_SANTOS"),
+                lambda: self.rede.aplicar_condicoes_climaticas(False),
+                lambda: self.rede.desbloquear_aresta("A", "C"),
+            ):
+                passo()
+                self.rede.limpar_cache_rotas()
+                tabela = self.rede.buscar_rotas_por_porto("A", destinos)[2]
+                self.assertEqual(tabela, _tabela_completa())
+            self.assertEqual(tabela["PORT_SANTOS"], (162.50, ["A", "B", "PORT_SANTOS"]))
+            contadores = self.rede.snapshot_metricas()["contadores"]
+            self.assertGreater(contadores["arvore.estados_reparados"], 0)
+        finally:
+            self.rede.acompanhar_origem(None)
+            self.rede.definir_bloqueios(set())
+            self.rede.aplicar_condicoes_climaticas(False)
+
+    def test_regras_clima_vetorizadas(self):
+        """Testa a tabela de regras de clima, os níveis e as variantes em lote."""
+        regras = [
+            {"modal": "road", "fator_peso": 1.1},
+            {
+                "info": "Ruim",
+                "fator_peso": 2.0,
+                "fator_falha": 3.0,
+                "teto_falha": 0.9,
+                "sufixo_rotulo": " (X)",
+                "intensidade_min": 1.0,
+            },
+            {"arestas": [["B", "PORT_SANTOS"]], "peso": 80},
+        ]
+        self.rede.definir_regras_clima(regras, {"seco": 0, "fraca": 0.5, "forte": 1})
+
+        self.rede.aplicar_nivel_chuva("fraca")
+        self.assertAlmostEqual(self.rede.graph["A"]["B"]["weight"], 105)
+        self.assertAlmostEqual(self.rede.graph["B"]["PORT_SANTOS"]["weight"], 65)
+        self.assertEqual(self.rede.graph["A"]["C"]["label"], "Road2")
+
+        self.rede.aplicar_nivel_chuva("forte")
+        self.assertAlmostEqual(self.rede.graph["A"]["C"]["weight"], 440)
+        self.assertEqual(self.rede.graph["A"]["C"]["label"], "Road2 (X)")
+        malha = self.rede._malha
+        for u, v, d in self.rede.graph.edges(data=True):
+            self.assertEqual(malha.peso[malha.posicao_aresta(u, v)], d["weight"])
+        self.assertEqual(self.rede.buscar_melhor_rota("A", ["PORT_SANTOS"])[0], 202.5)
+
+        perfil = self.rede.perfil_clima()
+        self.assertEqual(perfil.periodos, ["seco", "fraca", "forte"])
+        np.testing.assert_array_equal(perfil.peso[:, 2], malha.peso)
+        janela = self.rede.buscar_melhor_janela("A", ["PORT_SANTOS"], perfil)
+        self.assertEqual(list(janela["custos"]), [162.5, 182.5, 202.5])
+
+        self.rede.aplicar_nivel_chuva("seco")
+        self.assertEqual(self.rede.graph["A"]["C"]["weight"], 200)
+
+        # Tabela sem "intensa": o botão de chuva usa o nível mais forte
+        self.rede.aplicar_condicoes_climaticas(True)
+        self.assertEqual(self.rede.nivel_chuva, "forte")
+        self.rede.aplicar_condicoes_climaticas(False)
+        with self.assertRaises(ValueError):
+            self.rede.aplicar_nivel_chuva("granizo")
+
+    def test_rota_segura_e_fronteira_risco(self):
+        """Testa os objetivos com risco e a fronteira custo x confiabilidade."""
+
+        def _aresta(u, v, peso, modal, p):
+            return {
+                "u": u,
+                "v": v,
+                "weight": peso,
+                "distance": peso,
+                "label": f"{u}{v}",
+                "info": "OK",
+                "type": modal,
+                "failure_prob": p,
+            }
+
+        dados = {
+            "meta": {},
+            "nodes": {n: [i, i] for i, n in enumerate("ABCDP")},
+            "edges": [
+                _aresta("A", "B", 10, "road", 0.4),  # Barata e arriscada
+                _aresta("B", "P", 10, "road", 0.4),
+                _aresta("A", "D", 20, "road", 0.1),  # Meio-termo
+                _aresta("D", "P", 20, "road", 0.1),
+                _aresta("A", "C", 30, "rail", 0.0),  # Cara e segura
+                _aresta("C", "P", 30, "rail", 0.0),
+            ],
+        }
+        with tempfile.TemporaryDirectory() as pasta:
+            arquivo = os.path.join(pasta, "risco.json")
+            with open(arquivo, "w", encoding="utf-8") as f:
+                json.dump(dados, f)
+            rede = SoyLogisticsNet()
+            rede.carregar_dados(arquivo)
+
+        def _via(objetivo, **kw):
+            return rede.buscar_rota_segura("A", ["P"], objetivo, **kw)["caminho"][1]
+
+        self.assertEqual(_via("custo"), "B")
+        self.assertEqual(_via("esperado"), "B")  # 33.3 contra 44.4 e 60
+        self.assertEqual(_via("risco", lambda_risco=50), "D")
+        self.assertEqual(_via("confiabilidade"), "C")
+        rota = rede.buscar_rota_segura("A", ["P"], "risco", lambda_risco=50)
+        self.assertEqual((rota["custo"], rota["porto"]), (40, "P"))
+        self.assertAlmostEqual(rota["confiabilidade"], 0.81)
+
+        fronteira = rede.fronteira_risco("A", ["P"])
+        self.assertEqual([r["caminho"][1] for r in fronteira], ["B", "D", "C"])
+        self.assertEqual([r["custo"] for r in fronteira], [20, 40, 60])
+        self.assertEqual(fronteira[-1]["prob_falha"], 0.0)
+
+        rede.bloquear_aresta("A", "D")
+        fronteira = rede.fronteira_risco("A", ["P"])
+        self.assertEqual([r["caminho"][1] for r in fronteira], ["B", "C"])
+        self.assertEqual(rede.fronteira_risco("A", ["NARNIA"]), [])
+        with self.assertRaises(ValueError):
+            rede.buscar_rota_segura("A", ["P"], "sorte")
+
     def test_destino_inexistente(self):
         """Testa resiliência contra destinos que não estão no mapa."""
         custo, caminho = self.rede.buscar_melhor_rota("A", ["NARNIA"])